@@ -1,38 +1,148 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Optional
-import os, subprocess, io, shutil
-from dotenv import load_dotenv
-from supabase import create_client, Client
-from brightdata import bdclient
-from fastapi.responses import JSONResponse
-from tempfile import TemporaryDirectory
-from fastapi.responses import StreamingResponse
-import ollama
-from jobspy import scrape_linkedin_url_to_json
-
-
+from typing import TYPE_CHECKING, List, Optional
+import os, json, hashlib, subprocess, sys, time, zipfile
 import asyncio
-from typing import List
-from pydantic import BaseModel
-from playwright.async_api import async_playwright
-
-
+from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+import clients
+import metrics
+import scrape
+import storage
+import work_queue
+import latex_compile
+import latex_templates
+import pdf_cache
+import matching
+import job_index
+import embeddings
+from cache import CACHE_DIR, LRUCache, SingleFlight, TieredCache
+import keywords
+from keywords import extract_keywords_from_job_desc, extract_keywords_many
+
+if TYPE_CHECKING:
+    from supabase import AClient
+
+if not clients.SUPABASE_URL or not clients.SUPABASE_KEY or not clients.BRIGHTDATA_API:
+    raise RuntimeError("Missing SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY or BRIGHTDATA_API")
+
+_started = time.perf_counter()  # process import start, for /ready's startup_ms
+startup_ms: Optional[float] = None
+
+# Set in lifespan() (see clients); the async client needs a running event loop.
+supabase: "AClient" = None
+
+# Profile/job scrapes run in worker processes (worker.py) off the durable queue,
+# started by one API process per host (see _supervisor_lock).
+# 0 = don't start any here (run `python worker.py` separately).
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))
+
+# Profiles of one /api/profiles/batch request that may be in extraction/persistence at once
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "1000"))
+BATCH_RESUME_MAX = int(os.getenv("BATCH_RESUME_MAX", "50"))  # job ids per /api/resume/{id}/batch
+MATCH_MAX_JOBS = int(os.getenv("MATCH_MAX_JOBS", "1000"))  # jobs per /api/match
+MATCH_MAX_EXTRACT = int(os.getenv("MATCH_MAX_EXTRACT", "20"))  # of those, jobs without keywords (one LLM call each)
+
+# Per-stage concurrency: scrape (scrape.SCRAPE_CONCURRENCY), LLM (keywords.LLM_CONCURRENCY),
+# DB (below) and tectonic (latex_compile.COMPILE_CONCURRENCY) each get their own limit.
+DB_CONCURRENCY = int(os.getenv("DB_CONCURRENCY", "16"))
+_db_slots = asyncio.Semaphore(DB_CONCURRENCY)
+
+
+async def _db(query, name: str):
+    """Executes a PostgREST query builder on the async client, within the DB stage limit; timed as db_<name>."""
+    async with _db_slots:
+        with metrics.stage(f"db_{name}"):
+            return await query.execute()
+
+
+JOB_INDEX_PAGE = 1000
+
+
+async def _backfill_job_index():
+    """Fills an empty job_index from the jobs table (first start, or a wiped cache dir)."""
+    if job_index.stats()["jobs"]:
+        return
+    start = 0
+    try:
+        while True:
+            resp = await _db(
+                supabase.table("jobs").select("id, title, company, keywords")
+                .order("id").range(start, start + JOB_INDEX_PAGE - 1),
+                "select_jobs",
+            )
+            rows = resp.data or []
+            await asyncio.to_thread(job_index.add_many, rows)
+            if len(rows) < JOB_INDEX_PAGE:
+                break
+            start += JOB_INDEX_PAGE
+    except Exception as e:
+        print(f"⚠️ Job index backfill failed: {e}")
+        return
+    print(f"✅ Job index backfilled with {job_index.stats()['jobs']} jobs")
 
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-BRIGHTDATA_API = "513f4286533507f9d51c62bf6a9325ffa00e0e457d8ec875252a05163e152075"
-JOB_POSTING_API = ""
-client = bdclient(api_token=BRIGHTDATA_API)
-if not SUPABASE_URL or not SUPABASE_KEY or not BRIGHTDATA_API:
-    raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+def _supervisor_lock():
+    """
+    With uvicorn --workers, every worker process runs lifespan(); only the one
+    holding this lock (until it exits) starts the queue workers. None if taken.
+    """
+    import fcntl
+    lock = open(os.path.join(CACHE_DIR, "workers.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-app = FastAPI(title="Resu.mk API")
+async def _stop_workers(workers: subprocess.Popen) -> None:
+    workers.terminate()
+    try:
+        await asyncio.to_thread(workers.wait, 15)
+    except subprocess.TimeoutExpired:
+        print("⚠️ Queue workers didn't stop within 15s, killing them")
+        workers.kill()
+        await asyncio.to_thread(workers.wait)
+
+
+async def brightdata_client() -> scrape.BrightData:
+    """Dependency for endpoints that scrape (built at startup, or by the first caller)."""
+    return await clients.brightdata()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global supabase, startup_ms
+    metrics.prune_dead()
+    supabase = await clients.supabase()
+    # Everything else warms in the background; requests before it finishes pay for it themselves.
+    warm_up = asyncio.create_task(latex_compile.warm_up(*latex_templates.preambles()))
+    backfill = asyncio.create_task(_backfill_job_index())
+    await clients.brightdata()
+    workers = lock = None
+    if WORKER_PROCESSES > 0 and (lock := _supervisor_lock()) is not None:
+        workers = subprocess.Popen(
+            [sys.executable, "worker.py", "--processes", str(WORKER_PROCESSES), "--parent", str(os.getpid())],
+            cwd=os.path.dirname(__file__) or ".",
+        )
+    startup_ms = round((time.perf_counter() - _started) * 1000, 1)
+    print(f"✅ Ready to serve {startup_ms} ms after import")
+    yield
+    warm_up.cancel()
+    backfill.cancel()
+    if workers is not None:
+        await _stop_workers(workers)
+    if lock is not None:
+        lock.close()
+    await clients.aclose()
+
+
+app = FastAPI(title="Resu.mk API", lifespan=lifespan)
 
 # CORS (allow extension + local dev)
 allowed_origins = []
@@ -55,12 +165,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Per-stage Server-Timing header on every response, plus the request latency histogram."""
+    token = metrics.start_request()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = metrics.end_request(token)
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(elapsed)
+    # streamed bodies (NDJSON/SSE/PDF) only include the stages that ran before the headers went out
+    response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed * 1000)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
 # ---------- Schemas ----------
 class UrlPayload(BaseModel):
     url: str
 
+
+class BatchUrlPayload(BaseModel):
+    urls: List[str] = Field(min_length=1, max_length=BATCH_MAX_URLS)
+
 class Experience(BaseModel):
     title: str
     company: Optional[str] = None
@@ -84,6 +219,7 @@ class ProfilePayload(BaseModel):
     headline: Optional[str] = None
     linkedin_url: Optional[str] = None
     location: Optional[str] = None
+    about: Optional[str] = None
     experiences: List[Experience] = Field(default_factory=list)
     education: List[Education] = Field(default_factory=list)
     skills: List[str] = Field(default_factory=list)
@@ -96,9 +232,28 @@ class JobPayload(BaseModel):
     keywords: List[str] = Field(default_factory=list)
 
 
+class MatchRequest(BaseModel):
+    # either an inline profile or a stored one
+    profile: Optional[ProfilePayload] = None
+    profile_id: Optional[int] = None
+    jobs: List[JobPayload] = Field(min_length=1, max_length=MATCH_MAX_JOBS)
+
+
+class TailorRequest(BaseModel):
+    profile: Optional[ProfilePayload] = None
+    profile_id: Optional[int] = None
+    job: JobPayload
+
+
+class BatchResumeRequest(BaseModel):
+    job_ids: List[int] = Field(min_length=1, max_length=BATCH_RESUME_MAX)
+    template: str = latex_templates.DEFAULT_TEMPLATE
+
+
 class ComposeRequest(BaseModel):
     profile: ProfilePayload
     job: JobPayload
+    template: str = latex_templates.DEFAULT_TEMPLATE  # classic | modern | compact
     # optional: let the client request 'latex_only' for debugging
     latex_only: Optional[bool] = False
 
@@ -107,174 +262,84 @@ class ComposeRequest(BaseModel):
 
 
 
-def extract_keywords_from_resume(text: str, model: str = "llama3") -> list[str]:
-    """
-    Uses a local Ollama model to extract key skills or technologies
-    mentioned in a job description. Returns a list of short keywords.
-    """
-    if not text:
-        return []
-    prompt = (
-        "Extract 5 to 10 relevant, concise professional keywords "
-        "from this resume. EACH KEYWORD SHOULD ONLY BE SEPARATED BY A COMMA, NO SPACE AFTER.\n\n"
-        f"{text}"
-    )
+def _date_range(e: Experience) -> str:
+    return " -- ".join(d for d in (e.start_date, e.end_date) if d)
 
-    try:
-        response = ollama.chat(model=model, messages=[{"role": "user", "content": prompt}])
-        raw = response["message"]["content"]
-        # clean and split into list
-        return [kw.strip() for kw in raw.replace("\n", ",").split(",") if kw.strip()]
-    except Exception as e:
-        print(f"Ollama keyword extraction failed: {e}")
-        return []
 
-def extract_keywords_from_job_desc(text: str, model: str = "llama3") -> list[str]:
-    """
-    Uses a local Ollama model to extract key skills or technologies
-    mentioned in a job description. Returns a list of short keywords.
-    """
-    if not text:
-        return []
-    prompt = (
-        "Extract 5 to 10 relevant, concise professional keywords "
-        "from this resume. EACH KEYWORD SHOULD ONLY BE SEPARATED BY A COMMA, NO SPACE AFTER.\n\n"
-        f"{text}"
-    )
+def _template(name: Optional[str]) -> latex_templates.Template:
+    template = latex_templates.get(name)
+    if template is None:
+        raise HTTPException(status_code=422, detail=f"Unknown template {name!r}; use one of {list(latex_templates.TEMPLATES)}")
+    return template
 
-    try:
-        response = ollama.chat(model=model, messages=[{"role": "user", "content": prompt}])
-        raw = response["message"]["content"]
-        # clean and split into list
-        return [kw.strip() for kw in raw.replace("\n", ",").split(",") if kw.strip()]
-    except Exception as e:
-        print(f"Ollama keyword extraction failed: {e}")
-        return []
-
-def _esc(s: str) -> str:
-    mp = {'&':'\\&','%':'\\%','$':'\\$','#':'\\#','_':'\\_','{':'\\{','}':'\\}',
-          '~':'\\textasciitilde{}','^':'\\textasciicircum{}','\\':'\\textbackslash{}'}
-    return "".join(mp.get(c, c) for c in (s or ""))
-
-def _build_latex(profile: ProfilePayload, job: JobPayload) -> str:
-    exp = "\n\n".join(
-        f"\\entry{{{_esc(e.date or '')}}}{{{_esc(e.title or '')}}}{{{_esc(e.company or '')}}}{{\n  {_esc(e.description or '')}\n}}"
-        for e in (profile.experiences or [])[:5]
-    ) or "N/A"
-
-    latex = f"""
-\\documentclass[10pt,a4paper]{{article}}
-\\usepackage[margin=1.6cm]{{geometry}}
-\\usepackage{{hyperref}}
-\\usepackage{{enumitem}}
-\\usepackage{{titlesec}}
-\\titleformat*{{\\section}}{{\\large\\bfseries}}
-\\setlength{{\\parskip}}{{4pt}}
-\\newcommand{{\\entry}}[4]{{\\noindent\\textbf{{##2}} \\hfill {{\\small ##1}}\\\\\\textit{{##3}}\\\\##4\\vspace{{6pt}}}}
-
-\\begin{{document}}
-\\begin{{center}}
-{{\\Huge {_esc(profile.name or 'Name')}}}\\\\[2pt]
-{{\\small {_esc(profile.headline or '')}}}\\\\
-\\vspace{{4pt}}\\hrule\\vspace{{8pt}}
-\\end{{center}}
-
-\\section*{{Target Role}}
-{_esc(job.title or '')} at {_esc(job.company or '')}
-
-\\section*{{Profile}}
-{_esc(profile.about or '')}
-
-\\section*{{Experience}}
-{exp}
-
-\\section*{{Keywords match}}
-{_esc((job.desc or '')[:400])}...
-
-\\end{{document}}
-""".strip()
-    return latex
-
-def _compile_with_tectonic(latex_source: str, timeout_seconds: int = 20) -> bytes:
-    # Ensure tectonic is available
-    if not (sh := shutil.which("tectonic")):
-        raise HTTPException(status_code=500, detail="Tectonic not found on server PATH. Please install it.")
-
-    with TemporaryDirectory() as tmp:
-        tex_path = os.path.join(tmp, "main.tex")
-        pdf_path = os.path.join(tmp, "main.pdf")
-        
-        with open(tex_path, "w", encoding="utf-8") as f:
-            f.write(latex_source)
-
-        # Run tectonic (no shell-escape)
-        try:
-            result = subprocess.run(
-                [sh, "--keep-intermediates", "--outdir", tmp, tex_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=False,
-                timeout=timeout_seconds,
-                text=True,
-            )
-        except subprocess.TimeoutExpired:
-            raise HTTPException(status_code=504, detail="LaTeX compilation timed out.")
 
-        if result.returncode != 0 or not os.path.exists(pdf_path):
-            log = (result.stdout or "") + "\n" + (result.stderr or "")
-            raise HTTPException(status_code=400, detail=f"LaTeX compilation failed.\n{log}")
-
-        with open(pdf_path, "rb") as f:
-            return f.read()
+def _build_latex(profile: ProfilePayload, job: JobPayload, template: Optional[str] = None) -> str:
+    with metrics.stage("latex_render"):
+        experiences = [
+            latex_templates.experience_fragment(_date_range(e), e.title, e.company, e.description)
+            for e in (profile.experiences or [])[:5]
+        ]
+        return latex_templates.render(
+            _template(template), profile.name, profile.headline, profile.about, experiences,
+            job.title, job.company, job.desc,
+        )
 
 
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
-@app.post("/api/profile")
-def upsert_profile(link: UrlPayload):
+
+@app.get("/ready")
+async def ready():
     """
-    Scrapes LinkedIn profile using BrightData API,
-    extracts only resume-relevant fields, and stores them in Supabase.
+    Readiness, unlike /health (liveness): 503 until the Supabase and BrightData
+    clients exist and tectonic is installed. The tectonic warm-up is reported
+    but not required.
     """
-    # 1) Scrape LinkedIn
-    #data = client.scrape_linkedin.profiles(link.url)  
-    
-    #jiya's while loop
-    MAX_RETRIES = 10
-    attempt = 0
-    data = None
+    checks = {
+        "supabase": supabase is not None,
+        "brightdata": clients.status()["brightdata"],
+        "tectonic": latex_compile.available(),
+    }
+    body = {
+        "ready": all(checks.values()),
+        "checks": checks,
+        "tectonic_warmed": latex_compile.stats()["warmed"],
+        "startup_ms": startup_ms,
+        "client_init_ms": clients.timings,
+    }
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
 
-    while attempt < MAX_RETRIES:
-        try:
-            data = client.scrape_linkedin.profiles(link.url)
-            if data and isinstance(data, (dict, list)):
-                if isinstance(data, dict) and "snapshot_id" in data:
-                    print("⚠️ snapshot_id found on attempt", attempt + 1, "retrying...")
-                else:
-                    print("✅ Got valid JSON on attempt", attempt + 1)
-                    break
-                print("✅ Successfully got JSON data on attempt", attempt + 1)
-                break
-            else:
-                print("⚠️ Empty or invalid data on attempt", attempt + 1, "retrying...")
-            
-        except Exception as e:
-            print("❌ Error on attempt", attempt + 1, ":", e)
-        attempt += 1
 
-    if not data or ("snapshot_id" in data if isinstance(data, dict) else False):
-        raise RuntimeError("Failed to retrieve valid JSON without 'snapshot_id' after multiple attempts.")
- 
-    print(data)
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.exposition()
+    return Response(content=body, media_type=content_type)
 
-    #if not data:
-        #raise HTTPException(status_code=400, detail="Empty response from BrightData scraper")
 
+@app.get("/api/stats")
+def stats():
+    return {
+        "keyword_cache": keywords.cache.stats(),
+        "tectonic": latex_compile.stats(),
+        "pdf_cache": pdf_cache.stats(),
+        "storage": storage.stats(),
+        "queue": work_queue.stats(),
+        "templates": latex_templates.stats(),
+        "profile_cache": profile_cache.stats(),
+        "job_index": job_index.stats(),
+        "http_pools": clients.stats(),
+        "embeddings": embeddings.stats(),
+    }
 
-    # 2) Build ProfilePayload (only essential fields)
-    profile = ProfilePayload(
+
+def _profile_from_scrape(data: dict, exp_keywords: List[List[str]]) -> ProfilePayload:
+    """
+    Builds a ProfilePayload (only essential fields) from a BrightData profile record.
+    `exp_keywords` holds the extracted keywords for each entry of data["experience"].
+    """
+    return ProfilePayload(
         name=data.get("name", ""),
         headline=data.get("position", ""),
         linkedin_url=data.get("url") or data.get("input_url"),
@@ -284,12 +349,12 @@ def upsert_profile(link: UrlPayload):
                 title=exp.get("title", ""),
                 company=exp.get("company"),
                 location=exp.get("location"),
-                keywords=extract_keywords_from_resume(exp.get("description")),
+                keywords=kws,
                 description=exp.get("description"),
                 start_date=exp.get("start_date"),
                 end_date=exp.get("end_date"),
             )
-            for exp in data.get("experience", [])
+            for exp, kws in zip(data.get("experience") or [], exp_keywords)
         ],
         education=[
             Education(
@@ -299,74 +364,60 @@ def upsert_profile(link: UrlPayload):
                 start_year=edu.get("start_year"),
                 end_year=edu.get("end_year"),
             )
-            for edu in data.get("education", [])
+            for edu in data.get("education") or []
         ],
-        skills=data.get("skills", []),
+        skills=data.get("skills") or [],
     )
 
-    # 3) Upsert base profile row
-    # Some Supabase/PostgREST setups require a unique constraint for ON CONFLICT
-    # upserts. If the DB doesn't have that constraint, using on_conflict will
-    # raise a 42P10 error. To be compatible with more schemas, do a
-    # simple find-then-update/insert based on linkedin_url. If linkedin_url is
-    # not provided, always insert a new profile.
-
-    prof_row = None
-    if profile.linkedin_url:
-        # try to find an existing profile with this linkedin_url
-        find_resp = supabase.table("profiles").select("id").eq("linkedin_url", profile.linkedin_url).execute()
-        if getattr(find_resp, "error", None):
-            raise HTTPException(status_code=500, detail=f"profiles lookup failed: {find_resp.error.message}")
-        if find_resp.data:
-            # update existing row
-            existing_id = find_resp.data[0]["id"]
-            update_resp = supabase.table("profiles").update(
-                {
-                    "full_name": profile.name,
-                    "headline": profile.headline,
-                    "location": profile.location,
-                }
-            ).eq("id", existing_id).execute()
-            if getattr(update_resp, "error", None):
-                raise HTTPException(status_code=500, detail=f"profiles update failed: {update_resp.error.message}")
-            prof_row = (update_resp.data or [None])[0] or {"id": existing_id}
-        else:
-            # insert new
-            insert_resp = supabase.table("profiles").insert(
-                {
-                    "linkedin_url": profile.linkedin_url,
-                    "full_name": profile.name,
-                    "headline": profile.headline,
-                    "location": profile.location,
-                }
-            ).execute()
-            if getattr(insert_resp, "error", None):
-                raise HTTPException(status_code=500, detail=f"profiles insert failed: {insert_resp.error.message}")
-            prof_row = (insert_resp.data or [None])[0]
-    else:
-        # no linkedin_url provided, always insert
-        insert_resp = supabase.table("profiles").insert(
-            {
-                "full_name": profile.name,
-                "headline": profile.headline,
-                "location": profile.location,
-            }
-        ).execute()
-        if getattr(insert_resp, "error", None):
-            raise HTTPException(status_code=500, detail=f"profiles insert failed: {insert_resp.error.message}")
-        prof_row = (insert_resp.data or [None])[0]
 
-    if not prof_row:
-        raise HTTPException(status_code=500, detail="No profile row returned from Supabase")
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+profile_cache = TieredCache(LRUCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL))
+_profile_flight = SingleFlight()
+_profile_seq: Optional[int] = None  # newest work_queue invalidation applied to profile_cache
+
+FINGERPRINT_VERSION = "1"  # bump when the hashed fields below change
+
+
+def _digest(value) -> str:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
-    profile_id = prof_row["id"]
 
-    # 4) Replace experiences
-    supabase.table("experiences").delete().eq("profile_id", profile_id).execute()
-    if profile.experiences:
-        exp_rows = [
+def _keyed_rows(rows: List[dict], key_fields: tuple) -> List[dict]:
+    """
+    Tags child rows with a row_key (identity, from key_fields) and a row_hash
+    (full content) so the RPC can insert/update/delete only what moved.
+    Repeated identities get an occurrence suffix to keep keys unique.
+    """
+    seen = {}
+    for row in rows:
+        key = _digest([row.get(f) for f in key_fields])[:32]
+        seen[key] = seen.get(key, 0) + 1
+        row["row_key"] = key if seen[key] == 1 else f"{key}-{seen[key]}"
+        row["row_hash"] = _digest(row)
+    return rows
+
+
+async def _persist_profile(profile: ProfilePayload) -> dict:
+    """
+    Writes the profile row and its experiences, education and skills in one
+    round trip via the upsert_profile_graph RPC (backend/sql/), which runs as a
+    single transaction and returns the row counts.
+
+    The payload carries a content_hash of the whole profile: when it matches
+    the stored one, the RPC skips all child writes; otherwise only the child
+    rows whose row_key/row_hash changed are touched.
+    """
+    # The RPC looks the profile up by linkedin_url (no ON CONFLICT, so no unique
+    # constraint is needed) and always inserts a new profile without one.
+    payload = {
+        "linkedin_url": profile.linkedin_url,
+        "full_name": profile.name,
+        "headline": profile.headline,
+        "location": profile.location,
+        "experiences": _keyed_rows([
             {
-                "profile_id": profile_id,
                 "title": e.title,
                 "company": e.company,
                 "location": e.location,
@@ -375,17 +426,9 @@ def upsert_profile(link: UrlPayload):
                 "end_date": e.end_date,
             }
             for e in profile.experiences
-        ]
-        exp_resp = supabase.table("experiences").insert(exp_rows).execute()
-        if getattr(exp_resp, "error", None):
-            raise HTTPException(status_code=500, detail=f"experiences insert failed: {exp_resp.error.message}")
-
-    # 5) Replace education
-    supabase.table("education").delete().eq("profile_id", profile_id).execute()
-    if profile.education:
-        edu_rows = [
+        ], ("title", "company", "start_date")),
+        "education": _keyed_rows([
             {
-                "profile_id": profile_id,
                 "school": e.school,
                 "degree": e.degree,
                 "field": e.field,
@@ -393,88 +436,567 @@ def upsert_profile(link: UrlPayload):
                 "end_year": e.end_year,
             }
             for e in profile.education
-        ]
-        edu_resp = supabase.table("education").insert(edu_rows).execute()
-        if getattr(edu_resp, "error", None):
-            raise HTTPException(status_code=500, detail=f"education insert failed: {edu_resp.error.message}")
-
-    # 6) Replace skills
-    supabase.table("skills").delete().eq("profile_id", profile_id).execute()
-    if profile.skills:
-        skill_rows = [{"profile_id": profile_id, "name": s} for s in profile.skills]
-        skill_resp = supabase.table("skills").insert(skill_rows).execute()
-        if getattr(skill_resp, "error", None):
-            raise HTTPException(status_code=500, detail=f"skills insert failed: {skill_resp.error.message}")
-
-    # 7) Count for frontend feedback
-    exp_count_resp = supabase.table("experiences").select("id", count="exact").eq("profile_id", profile_id).execute()
-    exp_count = getattr(exp_count_resp, "count", 0) or 0
+        ], ("school", "degree", "start_year")),
+        "skills": _keyed_rows([{"name": s} for s in profile.skills], ("name",)),
+    }
+    payload["content_hash"] = f"v{FINGERPRINT_VERSION}:" + _digest(payload)
+    resp = await _db(supabase.rpc("upsert_profile_graph", {"payload": payload}), "upsert_profile_graph")
+    if getattr(resp, "error", None):
+        raise HTTPException(status_code=500, detail=f"profile upsert failed: {resp.error.message}")
+    counts = resp.data
+    if not counts or not counts.get("profile_id"):
+        raise HTTPException(status_code=500, detail="No profile row returned from Supabase")
+    if not counts.get("unchanged"):
+        profile_cache.pop(str(counts["profile_id"]))
+        await asyncio.to_thread(work_queue.invalidate, f"profile:{counts['profile_id']}")  # and in the other processes
 
     return {
         "success": True,
-        "profile_id": profile_id,
-        "experienceCount": exp_count,
+        "profile_id": counts["profile_id"],
+        "experienceCount": counts["experiences"],
+        "educationCount": counts["education"],
+        "skillCount": counts["skills"],
+        "unchanged": counts.get("unchanged", False),
+        "diff": counts.get("diff", {}),
         "name": profile.name,
         "headline": profile.headline,
         "skills": profile.skills,
     }
 
-@app.post("/api/job")
-def save_job(lol: UrlPayload):
+
+async def _process_profile(data: dict) -> dict:
+    # 2) Build ProfilePayload, extracting keywords for all experiences concurrently
+    descriptions = [exp.get("description") for exp in data.get("experience") or []]
+    # embeddings are only cached here, so /similar-jobs doesn't wait on Ollama later
+    exp_keywords, _ = await asyncio.gather(extract_keywords_many(descriptions), embeddings.embed_many(descriptions))
+    profile = _profile_from_scrape(data, exp_keywords)
+    return await _persist_profile(profile)
+
+
+def _task_status(task: dict) -> dict:
+    return {
+        "task_id": task["id"],
+        "kind": task["kind"],
+        "status": {work_queue.DONE: "done", work_queue.FAILED: "failed"}.get(task["status"], "pending"),
+        "state": task["status"],
+        "stage": task["stage"],
+        "attempts": task["attempts"],
+        "status_url": f"/api/tasks/{task['id']}",
+        "result": task["result"],
+        "error": task["error"],
+    }
+
+
+async def _enqueue_scrape(kind: str, url: str, idempotency_key: Optional[str]) -> JSONResponse:
     """
-    Stores the scraped job posting for later analysis / compose.
+    Queues a scrape -> extract -> persist task for the workers. Tasks are keyed
+    by the normalized URL, so repeats of a URL share one task whatever their
+    Idempotency-Key; the key only also finds the task it was first sent with.
+    A repeat gets the existing task: its result right away (200) when
+    finished, otherwise 202 with the status URL to poll.
     """
-    i = 0
+    key = f"{kind}:{scrape.normalize_url(url)}"
+    alias = f"{kind}:idem:{idempotency_key}" if idempotency_key else None
+    task, _ = await asyncio.to_thread(work_queue.enqueue, kind, {"url": url}, key, alias)
+    if task["status"] == work_queue.DONE:
+        return JSONResponse(status_code=200, content=task["result"])
+    return JSONResponse(status_code=202, content=_task_status(task))
 
-    while i < 10:
+
+@app.post("/api/profile")
+async def upsert_profile(link: UrlPayload, request: Request):
+    """
+    Scrapes LinkedIn profile using BrightData API,
+    extracts only resume-relevant fields, and stores them in Supabase.
+
+    Runs in a worker process: responds 202 with a status URL
+    (GET /api/tasks/{task_id}) whose result is the stored profile summary.
+    """
+    return await _enqueue_scrape("profile", link.url, request.headers.get("idempotency-key"))
+
+
+def _ndjson(obj: dict) -> str:
+    return json.dumps(obj, default=str) + "\n"
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/api/tailor/stream")
+async def tailor_stream(req: TailorRequest):
+    """
+    Server-Sent Events for the popup: one "experience" event per experience
+    ({experience, title, company, description}, the originals the bullets
+    replace), "keyword" events as the job's keywords are extracted, then
+    "bullet" events ({experience, bullet}) as each
+    experience is rewritten towards them (experiences run concurrently, within
+    the LLM limit), and a final "done". Everything is streamed from Ollama,
+    so the first results show up long before the full completions.
+    """
+    if req.profile is not None:
+        profile = req.profile
+    elif req.profile_id is not None:
+        profile = await _load_profile(req.profile_id)
+    else:
+        raise HTTPException(status_code=422, detail="Provide profile or profile_id")
+
+    async def stream():
+        for i, e in enumerate(profile.experiences):
+            yield _sse("experience", {"experience": i, "title": e.title, "company": e.company, "description": e.description})
+        job_keywords = list(req.job.keywords)
+        if job_keywords:
+            for kw in job_keywords:
+                yield _sse("keyword", {"keyword": kw})
+        else:
+            async for kw in keywords.stream_keywords(req.job.desc, "job"):
+                job_keywords.append(kw)
+                yield _sse("keyword", {"keyword": kw})
+
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def rewrite(i: int, description: Optional[str]):
+            try:
+                async for bullet in keywords.stream_bullets(description, job_keywords):
+                    await events.put(("bullet", {"experience": i, "bullet": bullet}))
+            finally:
+                await events.put(None)
+
+        tasks = [asyncio.create_task(rewrite(i, e.description)) for i, e in enumerate(profile.experiences)]
         try:
-            job = client.scrape_linkedin.jobs(lol.url)
+            remaining = len(tasks)
+            while remaining:
+                item = await events.get()
+                if item is None:
+                    remaining -= 1
+                else:
+                    yield _sse(*item)
+            yield _sse("done", {"keywords": len(job_keywords), "experiences": len(tasks)})
+        finally:
+            for t in tasks:
+                t.cancel()  # client went away
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-            # skip if payload is empty or has 'snapshot_id'
-            if job and isinstance(job, dict) and "snapshot_id" not in job:
-                break
-            else:
-                print("⚠️ Snapshot or invalid data returned, retrying...")
-            i += 1
+
+@app.post("/api/profiles/batch")
+async def upsert_profiles_batch(req: BatchUrlPayload, client=Depends(brightdata_client)):
+    """
+    Ingests many LinkedIn profiles with a single BrightData trigger.
+
+    Streams NDJSON: a "triggered" line, periodic "waiting" lines while the
+    snapshot builds, then one "result" line per URL as soon as its keyword
+    extraction and persistence finish (BATCH_CONCURRENCY profiles at a time),
+    and a final "done" summary.
+    """
+    urls = list(dict.fromkeys(scrape.normalize_url(u) for u in req.urls if u.strip()))
+    cached = dict(zip(urls, await asyncio.gather(*(scrape.cached_record("profiles", url) for url in urls))))
+    to_scrape = [url for url in urls if cached[url] is None]
+    scraped = set(to_scrape)
+
+    async def ingest(url: str, record: Optional[dict], slots: asyncio.Semaphore) -> dict:
+        if record is None:
+            return {"event": "result", "url": url, "success": False, "error": "No record returned by BrightData"}
+        try:
+            async with slots:
+                result = await _process_profile(record)
+            return {"event": "result", "url": url, **result}
+        except HTTPException as e:
+            return {"event": "result", "url": url, "success": False, "error": e.detail}
         except Exception as e:
-            print("❌ Error:", e)
-        i += 1
-
-    newlist = extract_keywords_from_job_desc(job.description)
-    resp = supabase.table("jobs").insert({
-        "title": job.title, "company": job.company, "desc": job.description, "keywords": newlist
-    }).execute()
-    if resp.error:
+            return {"event": "result", "url": url, "success": False, "error": str(e)}
+
+    async def stream():
+        records = []
+        try:
+            snapshot_id = None
+            if to_scrape:
+                snapshot_id, records = await scrape.trigger_many(client, "profiles", to_scrape)
+            yield _ndjson({"event": "triggered", "snapshot_id": snapshot_id, "urls": len(urls),
+                           "cached": len(urls) - len(to_scrape)})
+            if snapshot_id:
+                poll = asyncio.create_task(scrape.poll_snapshot_records(client, snapshot_id))
+                try:
+                    while True:
+                        try:
+                            records = await asyncio.wait_for(asyncio.shield(poll), 15)
+                            break
+                        except asyncio.TimeoutError:
+                            yield _ndjson({"event": "waiting", "snapshot_id": snapshot_id})
+                finally:
+                    poll.cancel()  # no-op once done; stops polling if the client went away
+        except HTTPException as e:
+            for url in to_scrape:
+                yield _ndjson({"event": "result", "url": url, "success": False, "error": e.detail})
+            scraped.clear()
+
+        await asyncio.gather(*(scrape.cache_record("profiles", scrape.record_url(r) or "", r) for r in records))
+        by_url = {scrape.normalize_url(scrape.record_url(r) or ""): r for r in records}
+        by_url.update((url, rec) for url, rec in cached.items() if rec is not None)
+        # URLs whose scrape failed outright were already reported above
+        pending = [url for url in urls if cached[url] is not None or url in scraped]
+        slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+        tasks = [asyncio.create_task(ingest(url, by_url.get(url), slots)) for url in pending]
+        succeeded = 0
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            succeeded += bool(line.get("success"))
+            yield _ndjson(line)
+        yield _ndjson({"event": "done", "succeeded": succeeded, "failed": len(urls) - succeeded})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+async def _persist_job(title: str, company: Optional[str], desc: Optional[str], newlist: List[str]) -> dict:
+    resp = await _db(supabase.table("jobs").insert({
+        "title": title, "company": company, "desc": desc, "keywords": newlist
+    }), "insert_job")
+    if getattr(resp, "error", None):
         raise HTTPException(status_code=500, detail=resp.error.message)
-    return {"success": True, "job_id": resp.data[0]["id"]}
+    job_id = resp.data[0]["id"]
+    await asyncio.to_thread(job_index.add, job_id, title, company, newlist)
+    await embeddings.index("job", job_id, desc)  # vector is already cached by _process_job
+    return {"success": True, "job_id": job_id}
+
+
+async def _process_job(data: dict) -> dict:
+    title = data.get("job_title") or data.get("title") or ""
+    company = data.get("company_name") or data.get("company")
+    desc = data.get("job_summary") or data.get("description") or data.get("desc")
+
+    # the embedding call runs alongside keyword extraction; _persist_job picks it up from the cache
+    newlist, _ = await asyncio.gather(extract_keywords_from_job_desc(desc), embeddings.embed_many([desc]))
+    return await _persist_job(title, company, desc, newlist)
+
+
+@app.post("/api/job")
+async def save_job(lol: UrlPayload, request: Request):
+    """
+    Stores the scraped job posting for later analysis / compose.
+    Same 200/202 contract as /api/profile.
+    """
+    return await _enqueue_scrape("job", lol.url, request.headers.get("idempotency-key"))
+
 
-def upload_pdf_to_supabase(file_path: str, file_name: str) -> str:
-    """Upload a PDF file to Supabase Storage and return its public URL."""
-    bucket = "resumes"
+@app.get("/api/tasks/{task_id}")
+async def task_status(task_id: str):
+    task = await asyncio.to_thread(work_queue.get, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Unknown task_id")
+    status = _task_status(task)
+    code = {"pending": 202, "done": 200}.get(status["status"], 502)
+    return JSONResponse(status_code=code, content=status)
 
-    # Ensure filename is unique & safe533333333333333333333333333333333333333333333333333333333333333333333333333333333333333333
-    base_name = os.path.basename(file_name).replace(" ", "_")
-    remote_path = f"{bucket}/{base_name}"
 
-    # Upload file
-    with open(file_path, "rb") as f:
-        res = supabase.storage.from_(bucket).upload(base_name, f)
-        if hasattr(res, "error") and res.error:
-            raise HTTPException(status_code=500, detail=f"Upload failed: {res.error.message}")
+async def upload_pdf_to_supabase(file_path: str) -> str:
+    """Upload a PDF file to Supabase Storage (content-addressed, see storage) and return its public URL."""
+    return await storage.upload_pdf(file_path)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or f'"{etag}"' in tags
+
+
+async def _pdf_response(request: Request, latex: str, filename: str):
+    """
+    Serves the PDF for `latex` from the content-addressed cache (compiling on a
+    miss), with an ETag so unchanged resumes come back as 304 Not Modified.
+    The file is streamed from disk in chunks, with Range/If-Range support.
+    """
+    etag = pdf_cache.key_for(latex)
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    path, stat = await pdf_cache.get_or_compile(etag, latex)
+    return FileResponse(path, media_type="application/pdf", headers=headers, stat_result=stat)
 
-    # Get public URL
-    public_url = supabase.storage.from_(bucket).get_public_url(base_name)
-    return public_url
 
 @app.post("/api/compose/pdf")
-def compose_pdf(req: ComposeRequest):
-    latex = _build_latex(req.profile, req.job)
+async def compose_pdf(req: ComposeRequest, request: Request):
+    latex = _build_latex(req.profile, req.job, req.template)
     if req.latex_only:
         # For debugging: return the LaTeX as text/plain
         return {"latex": latex}
-    pdf_bytes = _compile_with_tectonic(latex)
-    file_like = io.BytesIO(pdf_bytes)
-    headers = {
-        "Content-Disposition": 'attachment; filename="resume.pdf"'
+    return await _pdf_response(request, latex, "resume.pdf")
+
+
+def _profile_from_row(prof_data: dict) -> ProfilePayload:
+    return ProfilePayload(
+        name=prof_data.get("full_name", "No Name"),
+        headline=prof_data.get("headline"),
+        linkedin_url=prof_data.get("linkedin_url"),
+        location=prof_data.get("location"),
+        experiences=[
+            Experience(
+                title=e.get("title", ""),
+                company=e.get("company"),
+                location=e.get("location"),
+                description=e.get("description"),
+                start_date=e.get("start_date"),
+                end_date=e.get("end_date"),
+                keywords=[]
+            )
+            for e in prof_data.get("experiences") or []
+        ],
+        education=[
+            Education(
+                school=e.get("school"),
+                degree=e.get("degree"),
+                field=e.get("field"),
+                start_year=e.get("start_year"),
+                end_year=e.get("end_year"),
+            )
+            for e in prof_data.get("education") or []
+        ],
+        skills=[s.get("name") for s in prof_data.get("skills") or []],
+    )
+
+
+async def _drop_stale_profiles() -> int:
+    """
+    Pops the profiles other processes rewrote since the last check (see
+    work_queue.invalidate) and returns the invalidation seq now applied.
+    """
+    global _profile_seq
+    seq, stale = await asyncio.to_thread(work_queue.invalidated_since, "profile:", _profile_seq)
+    for key in stale:
+        profile_cache.pop(key)
+    _profile_seq = max(seq, _profile_seq or 0)
+    return _profile_seq
+
+
+async def _fetch_profile(profile_id: int, seq: int) -> ProfilePayload:
+    # Profile, experiences, education and skills in one embedded-resource select
+    resp = await _db(
+        supabase.table("profiles")
+        .select("*, experiences(*), education(*), skills(*)")
+        .eq("id", profile_id)
+        .limit(1),
+        "select_profile",
+    )
+    if getattr(resp, "error", None) or not resp.data:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    profile = _profile_from_row(resp.data[0])
+    if _profile_seq == seq:  # else it may have been rewritten while we read it
+        profile_cache.set(str(profile_id), profile)
+    return profile
+
+
+async def _load_profile(profile_id: int) -> ProfilePayload:
+    """
+    Read-through cache over the stored profile graph. _persist_profile
+    invalidates entries in every process through the queue database;
+    PROFILE_CACHE_TTL bounds staleness from writers outside this backend.
+    """
+    key = str(profile_id)
+    seq = await _drop_stale_profiles()
+    profile = profile_cache.get(key)
+    if profile is None:
+        profile = await _profile_flight.do(key, lambda: _fetch_profile(profile_id, seq))
+    return profile
+
+
+async def _experience_keywords(profile: ProfilePayload) -> List[List[str]]:
+    """Each experience's keywords, extracted from its description where none were given."""
+    todo = [i for i, e in enumerate(profile.experiences) if not e.keywords]
+    extracted = await extract_keywords_many([profile.experiences[i].description for i in todo])
+    result = [list(e.keywords) for e in profile.experiences]
+    for i, kws in zip(todo, extracted):
+        result[i] = kws
+    return result
+
+
+async def _job_keywords(job: JobPayload) -> List[str]:
+    return list(job.keywords) or await extract_keywords_from_job_desc(job.desc)
+
+
+@app.post("/api/match")
+async def match_jobs(req: MatchRequest):
+    """
+    Scores one profile against one or many jobs (see matching.score_jobs),
+    using the jobs' keywords and the profile's skills + experience keywords.
+    Keywords missing from the request (or from the stored experiences) are
+    extracted first, through the keyword cache; at most MATCH_MAX_EXTRACT
+    jobs per request may come without keywords.
+    Results come back in the order of req.jobs.
+    """
+    without_keywords = sum(1 for j in req.jobs if not j.keywords and j.desc)
+    if without_keywords > MATCH_MAX_EXTRACT:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{without_keywords} jobs have no keywords; at most {MATCH_MAX_EXTRACT} per request can be extracted",
+        )
+    if req.profile is not None:
+        profile = req.profile
+    elif req.profile_id is not None:
+        profile = await _load_profile(req.profile_id)
+    else:
+        raise HTTPException(status_code=422, detail="Provide profile or profile_id")
+
+    # Jobs from the popup ({title, company, desc}) and stored experiences carry no keywords;
+    # extract them (cached by content hash) so missing skills can show up at all.
+    exp_keywords, job_keywords = await asyncio.gather(
+        _experience_keywords(profile),
+        asyncio.gather(*(_job_keywords(j) for j in req.jobs)),
+    )
+    weights = matching.profile_terms(profile.skills, exp_keywords)
+    vocabulary = list(weights)
+    jobs_terms = [matching.job_terms(kws, j.desc, vocabulary) for j, kws in zip(req.jobs, job_keywords)]
+    n_docs, doc_freq = await asyncio.to_thread(
+        job_index.document_frequencies, [t for terms in jobs_terms for t in terms]
+    )
+    results = await asyncio.to_thread(matching.score_jobs, weights, jobs_terms, doc_freq, n_docs)
+    return {"results": results}
+
+
+@app.get("/api/profile/{profile_id}/top-jobs")
+async def top_jobs(profile_id: int, k: int = Query(10, ge=1, le=100)):
+    """
+    Best-fitting saved jobs for a stored profile, from the local inverted
+    keyword index (job_index) instead of scanning the jobs table.
+    """
+    profile = await _load_profile(profile_id)
+    # Stored experiences carry no keywords; the extraction cache makes this cheap after the first call.
+    exp_keywords = await _experience_keywords(profile)
+    weights = matching.profile_terms(profile.skills, exp_keywords)
+    return {"profile_id": profile_id, "results": job_index.top_jobs(weights, k)}
+
+
+@app.get("/api/profile/{profile_id}/similar-jobs")
+async def similar_jobs(profile_id: int, k: int = Query(10, ge=1, le=100)):
+    """
+    Saved jobs closest to a stored profile in embedding space: the centroid of
+    the profile's experience description vectors against every job description
+    vector, so synonyms ("k8s" / "Kubernetes") still match.
+    """
+    profile = await _load_profile(profile_id)
+    query = embeddings.mean_vector(await embeddings.embed_many([e.description for e in profile.experiences]))
+    if query is None:
+        raise HTTPException(status_code=422, detail="Profile has no experience descriptions to embed")
+    results = await embeddings.search(query, "job", k)
+    return {
+        "profile_id": profile_id,
+        "results": [{**(job_index.get(r["id"]) or {"job_id": r["id"]}), "score": r["score"]} for r in results],
     }
-    return StreamingResponse(file_like, media_type="application/pdf", headers=headers)
\ No newline at end of file
+
+
+@app.get("/api/resume/{profile_id}/pdf")
+async def generate_resume_pdf(profile_id: int, request: Request):
+    """
+    Generate a LaTeX PDF resume for a stored profile.
+    """
+    # 1️⃣ Load the profile graph (cached)
+    profile = await _load_profile(profile_id)
+
+    # 2️⃣ Build a dummy JobPayload (optional section)
+    job = JobPayload(title="", company="", desc="")
+
+    # 3️⃣ Generate LaTeX and compile PDF
+    latex_source = _build_latex(profile, job)
+    return await _pdf_response(request, latex_source, f"{_safe_filename(profile.name)}_resume.pdf")
+
+
+def _safe_filename(name: Optional[str]) -> str:
+    return "".join(c if c.isascii() and (c.isalnum() or c in "-_") else "_" for c in (name or "").strip()) or "untitled"
+
+
+class _ZipSink:
+    """Write-only, unseekable file for zipfile; drain() hands over what was written so far."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _zip_file(zf: zipfile.ZipFile, arcname: str, path: str, size: int) -> None:
+    info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+    info.file_size = size
+    info.compress_type = zipfile.ZIP_STORED  # PDFs are already compressed
+    with open(path, "rb") as src, zf.open(info, "w") as dst:
+        while chunk := src.read(64 * 1024):
+            dst.write(chunk)
+
+
+@app.post("/api/resume/{profile_id}/batch")
+async def generate_resume_batch(profile_id: int, req: BatchResumeRequest):
+    """
+    Tailored resumes of one stored profile for many saved jobs, as a ZIP.
+
+    The profile and the jobs are loaded once, every variant is rendered up
+    front and compiled in parallel (at most the compile pool's size at a time,
+    so a batch never fills the compile queue by itself), and each PDF goes
+    into the ZIP stream as soon as it is ready. manifest.json at the end maps
+    job ids to file names, or to the error when a compile failed.
+    """
+    template = _template(req.template)
+    profile = await _load_profile(profile_id)
+    job_ids = list(dict.fromkeys(req.job_ids))
+    resp = await _db(
+        supabase.table("jobs").select("id, title, company, desc").in_("id", job_ids), "select_jobs_batch"
+    )
+    jobs = {row["id"]: row for row in resp.data or []}
+    if not jobs:
+        raise HTTPException(status_code=404, detail="None of the job_ids were found")
+
+    variants = []
+    for n, job_id in enumerate(j for j in job_ids if j in jobs):
+        row = jobs[job_id]
+        job = JobPayload(title=row.get("title") or "", company=row.get("company") or "", desc=row.get("desc") or "")
+        latex = _build_latex(profile, job, template.name)
+        name = f"{n + 1:02d}_{_safe_filename(job.company)}_{_safe_filename(job.title)}.pdf"
+        variants.append((job_id, name, latex))
+
+    slots = asyncio.Semaphore(latex_compile.COMPILE_CONCURRENCY)
+
+    async def compile_one(job_id: int, name: str, latex: str):
+        async with slots:
+            try:
+                return job_id, name, await pdf_cache.get_or_compile(pdf_cache.key_for(latex), latex), None
+            except HTTPException as e:
+                return job_id, name, None, e.detail
+
+    async def stream():
+        sink = _ZipSink()
+        manifest = {"profile_id": profile_id, "files": {}, "errors": {}, "missing": [j for j in job_ids if j not in jobs]}
+        tasks = [asyncio.create_task(compile_one(*v)) for v in variants]
+        try:
+            with zipfile.ZipFile(sink, "w") as zf:
+                for next_done in asyncio.as_completed(tasks):
+                    job_id, name, compiled, error = await next_done
+                    if compiled is None:
+                        manifest["errors"][job_id] = error
+                        continue
+                    path, stat = compiled
+                    await asyncio.to_thread(_zip_file, zf, name, path, stat.st_size)
+                    manifest["files"][job_id] = name
+                    yield sink.drain()
+                zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+            yield sink.drain()
+        finally:
+            for t in tasks:
+                t.cancel()  # client went away: start no more compiles (running ones finish into the cache)
+
+    return StreamingResponse(stream(), media_type="application/zip", headers={
+        "Content-Disposition": f'attachment; filename="{_safe_filename(profile.name)}_resumes.zip"',
+    })
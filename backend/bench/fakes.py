@@ -0,0 +1,172 @@
+"""
+Local stand-ins for every service the API calls, served from one app:
+
+    /datasets/v3/...   BrightData trigger + snapshot download (202 until ready)
+    /rest/v1/...       PostgREST: upsert_profile_graph RPC, jobs insert/select, profile graph select
+    /api/chat          Ollama chat, streamed (NDJSON) or not
+    /api/embed         Ollama embeddings
+
+Latencies are set with BENCH_SCRAPE_MS (snapshot build time), BENCH_DB_MS
+and BENCH_LLM_MS. Run standalone with `python fakes.py [port]`.
+"""
+import asyncio, hashlib, itertools, json, os, sys, time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SCRAPE_MS = float(os.getenv("BENCH_SCRAPE_MS", "500"))
+DB_MS = float(os.getenv("BENCH_DB_MS", "5"))
+LLM_MS = float(os.getenv("BENCH_LLM_MS", "200"))
+EMBED_DIM = 64
+
+KEYWORDS = ["python", "sql", "kubernetes", "aws", "react", "docker", "go", "terraform", "spark", "airflow"]
+
+app = FastAPI(title="bench fakes")
+_snapshots = {}  # snapshot_id -> (ready_at, dataset_id, urls)
+_ids = itertools.count(1)
+
+
+def _profile_record(url: str) -> dict:
+    slug = url.rstrip("/").rsplit("/", 1)[-1]
+    return {
+        "input": {"url": url},
+        "url": url,
+        "name": f"Bench {slug}",
+        "position": "Engineer",
+        "city": "Prague",
+        "about": "Builds things. " * 20,
+        "experience": [
+            {"title": f"Engineer {i}", "company": f"Company {i}", "start_date": f"20{10 + i}",
+             "end_date": f"20{11 + i}", "description": f"Worked on {KEYWORDS[i]} and {KEYWORDS[i + 1]} at {slug}."}
+            for i in range(4)
+        ],
+        "education": [{"title": "CTU", "degree": "MSc", "field": "CS", "start_year": "2008", "end_year": "2010"}],
+        "skills": KEYWORDS[:5],
+    }
+
+
+def _job_record(url: str) -> dict:
+    return {
+        "input": {"url": url},
+        "url": url,
+        "job_title": "Backend Engineer",
+        "company_name": "Bench Corp",
+        "job_summary": f"We need {', '.join(KEYWORDS[2:8])}. Job {url}. " * 5,
+    }
+
+
+# ---------- BrightData ----------
+
+@app.post("/datasets/v3/trigger")
+async def trigger(request: Request, dataset_id: str):
+    urls = [item["url"] for item in await request.json()]
+    snapshot_id = f"s_{next(_ids)}"
+    _snapshots[snapshot_id] = (time.monotonic() + SCRAPE_MS / 1000, dataset_id, urls)
+    return {"snapshot_id": snapshot_id}
+
+
+@app.get("/datasets/v3/snapshot/{snapshot_id}")
+async def snapshot(snapshot_id: str):
+    ready_at, dataset_id, urls = _snapshots[snapshot_id]
+    if time.monotonic() < ready_at:
+        return JSONResponse(status_code=202, content={"status": "running", "message": "Snapshot is not ready yet"})
+    make = _profile_record if dataset_id == "gd_l1viktl72bvl7bjuj0" else _job_record
+    return [make(u) for u in urls]
+
+
+# ---------- PostgREST ----------
+
+_profiles = {}  # profile_id -> graph payload
+_profile_ids = {}  # linkedin_url -> profile_id
+_job_ids = itertools.count(1)
+_jobs = {}  # job_id -> row
+
+
+@app.post("/rest/v1/rpc/upsert_profile_graph")
+async def upsert_profile_graph(request: Request):
+    await asyncio.sleep(DB_MS / 1000)
+    payload = (await request.json())["payload"]
+    url = payload.get("linkedin_url")
+    profile_id = _profile_ids.setdefault(url, len(_profile_ids) + 1) if url else len(_profile_ids) + 1
+    unchanged = _profiles.get(profile_id, {}).get("content_hash") == payload.get("content_hash")
+    _profiles[profile_id] = payload
+    return {
+        "profile_id": profile_id, "unchanged": unchanged, "diff": {},
+        "experiences": len(payload["experiences"]), "education": len(payload["education"]), "skills": len(payload["skills"]),
+    }
+
+
+@app.get("/rest/v1/profiles")
+async def select_profile(request: Request):
+    await asyncio.sleep(DB_MS / 1000)
+    profile_id = int(request.query_params.get("id", "eq.1").split(".", 1)[1])
+    payload = _profiles.get(profile_id)
+    if payload is None:
+        return []
+    return [{
+        "id": profile_id,
+        "full_name": payload["full_name"], "headline": payload["headline"],
+        "linkedin_url": payload["linkedin_url"], "location": payload["location"],
+        "experiences": payload["experiences"], "education": payload["education"], "skills": payload["skills"],
+    }]
+
+
+@app.post("/rest/v1/jobs")
+async def insert_job(request: Request):
+    await asyncio.sleep(DB_MS / 1000)
+    row = await request.json()
+    job_id = next(_job_ids)
+    row = _jobs[job_id] = {**row, "id": job_id}
+    return JSONResponse(status_code=201, content=[row])
+
+
+@app.get("/rest/v1/jobs")
+async def select_jobs(request: Request):
+    # only `id=in.(...)` lookups; the index backfill sees an empty table
+    ids = request.query_params.get("id", "")
+    if not ids.startswith("in.("):
+        return []
+    await asyncio.sleep(DB_MS / 1000)
+    return [_jobs[int(i)] for i in ids[4:-1].split(",") if i and int(i) in _jobs]
+
+
+# ---------- Ollama ----------
+
+def _keywords_for(text: str) -> str:
+    h = int(hashlib.sha256(text.encode()).hexdigest(), 16)
+    return ",".join(KEYWORDS[(h >> i) % len(KEYWORDS)] for i in range(0, 30, 5))
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    content = _keywords_for(body["messages"][-1]["content"])
+    if not body.get("stream"):
+        await asyncio.sleep(LLM_MS / 1000)
+        return {"model": body["model"], "done": True, "message": {"role": "assistant", "content": content}}
+
+    async def stream():
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        for piece in pieces:
+            await asyncio.sleep(LLM_MS / 1000 / len(pieces))
+            yield json.dumps({"model": body["model"], "done": False, "message": {"role": "assistant", "content": piece}}) + "\n"
+        yield json.dumps({"model": body["model"], "done": True, "message": {"role": "assistant", "content": ""}}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/embed")
+async def embed(request: Request):
+    body = await request.json()
+    texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+    await asyncio.sleep(LLM_MS / 1000 / 4)
+    vectors = []
+    for t in texts:
+        digest = hashlib.sha256(t.encode()).digest()
+        vectors.append([(digest[i % 32] - 128) / 128 for i in range(EMBED_DIM)])
+    return {"model": body["model"], "embeddings": vectors}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8900, log_level="warning")
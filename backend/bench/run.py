@@ -0,0 +1,220 @@
+"""
+Offline benchmark: starts the fakes (bench/fakes.py) and the API against
+them, drives the main endpoints at a fixed concurrency, and reports latency
+percentiles and throughput per endpoint.
+
+    python bench/run.py --requests 200 --concurrency 16
+    python bench/run.py --endpoints compose,resume --real-tectonic
+
+Inputs are unique per request by default, so scrape, keyword, PDF and
+profile caches start cold; --repeat-inputs sends the same input every time
+to measure the warm path. Fake latencies come from BENCH_SCRAPE_MS,
+BENCH_DB_MS, BENCH_LLM_MS and BENCH_TECTONIC_MS; any other env var (e.g.
+SCRAPE_POLL_INITIAL, COMPILE_CONCURRENCY) is passed through to the API.
+"""
+import argparse, asyncio, json, math, os, socket, subprocess, sys, tempfile, time
+from typing import Callable, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+# Not a real key; supabase-py only checks that it looks like a JWT.
+FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.YmVuY2g"
+ENDPOINTS = ["profile", "job", "compose", "resume"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(args: List[str], env: dict, cwd: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], env=env, cwd=cwd)
+
+
+async def _wait_for(url: str, timeout: float = 60, ok=(200,)):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code in ok:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    # nearest rank: the smallest value with at least p% of the samples at or below it
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+async def _follow(client: httpx.AsyncClient, resp: httpx.Response, interval: float = 0.05) -> httpx.Response:
+    """Polls a 202's status_url (queued tasks, pending snapshots) until it stops answering 202."""
+    while resp.status_code == 202 and (status_url := resp.json().get("status_url")):
+        await asyncio.sleep(interval)
+        resp = await client.get(status_url)
+    return resp
+
+
+async def drive(client: httpx.AsyncClient, name: str, make_request: Callable[[int], httpx.Request],
+                n: int, concurrency: int, on_response=None) -> dict:
+    """
+    Sends n requests, at most `concurrency` at a time; returns latency stats in
+    ms. Accepted (202) requests are timed until their task or snapshot finishes.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i: int):
+        async with slots:
+            request = make_request(i)
+            started = time.perf_counter()
+            try:
+                resp = await client.send(request)
+                await resp.aread()
+                resp = await _follow(client, resp)
+                status = resp.status_code
+                if on_response is not None:
+                    on_response(resp)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "requests": n,
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else None,
+        "throughput_rps": round(n / wall, 2) if wall else None,
+    }
+
+
+def _print(results: List[dict]):
+    print(f"\n{'endpoint':<26} {'n':>5} {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}  statuses")
+    for r in results:
+        fmt = lambda v: f"{v:9.1f}" if v is not None else f"{'-':>9}"
+        print(f"{r['endpoint']:<26} {r['requests']:>5} {r['concurrency']:>5} {fmt(r['p50_ms'])} {fmt(r['p95_ms'])}"
+              f" {fmt(r['p99_ms'])} {r['throughput_rps']:>8}  {r['statuses']}")
+
+
+async def bench(args) -> List[dict]:
+    fake_port, api_port = _free_port(), _free_port()
+    fake_url, api_url = f"http://127.0.0.1:{fake_port}", f"http://127.0.0.1:{api_port}"
+    cache_dir = tempfile.mkdtemp(prefix="resumk-bench-")
+    env = {
+        **os.environ,
+        "SUPABASE_URL": fake_url,
+        "SUPABASE_SERVICE_ROLE_KEY": FAKE_KEY,
+        "BRIGHTDATA_API": "bench",
+        "OLLAMA_HOST": fake_url,
+        "BRIGHTDATA_BASE_URL": fake_url,
+        "CACHE_DIR": cache_dir,
+        "SCRAPE_POLL_INITIAL": os.getenv("SCRAPE_POLL_INITIAL", "0.25"),
+        "SCRAPE_POLL_MAX": os.getenv("SCRAPE_POLL_MAX", "1"),
+    }
+    if not args.real_tectonic:
+        env["TECTONIC_BIN"] = os.path.join(BENCH_DIR, "tectonic")
+
+    procs = [_start([os.path.join(BENCH_DIR, "fakes.py"), str(fake_port)], env, BENCH_DIR)]
+    procs.append(_start(["-m", "uvicorn", "api:app", "--port", str(api_port), "--log-level", "warning",
+                         "--workers", str(args.workers)], env, BACKEND_DIR))
+    try:
+        await _wait_for(f"{fake_url}/docs")
+        await _wait_for(f"{api_url}/health")
+        print(f"API on {api_url}, fakes on {fake_url}, cache dir {cache_dir}")
+
+        n, conc = args.requests, args.concurrency
+        key = (lambda i: 0) if args.repeat_inputs else (lambda i: i)
+        results, profile_ids = [], []
+        limits = httpx.Limits(max_connections=conc, max_keepalive_connections=conc)
+        async with httpx.AsyncClient(base_url=api_url, timeout=args.timeout, limits=limits) as client:
+            if "profile" in args.endpoints or "resume" in args.endpoints:
+                def keep_id(resp):
+                    if resp.status_code == 200 and (pid := (resp.json().get("result") or resp.json()).get("profile_id")):
+                        profile_ids.append(pid)
+                results.append(await drive(
+                    client, "POST /api/profile",
+                    lambda i: client.build_request("POST", "/api/profile", json={"url": f"https://www.linkedin.com/in/bench-{key(i)}"}),
+                    n, conc, keep_id,
+                ))
+            if "job" in args.endpoints:
+                results.append(await drive(
+                    client, "POST /api/job",
+                    lambda i: client.build_request("POST", "/api/job", json={"url": f"https://www.linkedin.com/jobs/view/{4000000000 + key(i)}"}),
+                    n, conc,
+                ))
+            if "compose" in args.endpoints:
+                profile = {
+                    "name": "Bench Person", "headline": "Engineer", "about": "Builds things.",
+                    "experiences": [{"title": f"Engineer {e}", "company": "Co", "description": "Did work. " * 20,
+                                     "start_date": "2020"} for e in range(4)],
+                    "skills": ["python", "sql"],
+                }
+                results.append(await drive(
+                    client, "POST /api/compose/pdf",
+                    lambda i: client.build_request("POST", "/api/compose/pdf", json={
+                        "profile": profile, "job": {"title": f"Role {key(i)}", "company": "Bench Corp", "desc": "python sql"},
+                    }),
+                    n, conc,
+                ))
+            if "resume" in args.endpoints:
+                if not profile_ids:
+                    print("⚠️ no profiles were stored, skipping /api/resume/{id}/pdf")
+                else:
+                    ids = sorted(set(profile_ids))
+                    results.append(await drive(
+                        client, "GET /api/resume/{id}/pdf",
+                        lambda i: client.build_request("GET", f"/api/resume/{ids[key(i) % len(ids)]}/pdf"),
+                        n, conc,
+                    ))
+            if args.show_stats:
+                print(json.dumps((await client.get("/api/stats")).json(), indent=2))
+        return results
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", "-n", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", "-c", type=int, default=10)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"comma-separated subset of {ENDPOINTS}")
+    parser.add_argument("--repeat-inputs", action="store_true", help="same input for every request (warm caches)")
+    parser.add_argument("--real-tectonic", action="store_true", help="use tectonic from PATH instead of the stub")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--show-stats", action="store_true", help="print /api/stats after the run")
+    args = parser.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    if unknown := set(args.endpoints) - set(ENDPOINTS):
+        parser.error(f"unknown endpoints: {sorted(unknown)}")
+
+    results = asyncio.run(bench(args))
+    _print(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import asyncio, json, os, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(__file__), ".cache"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU with an optional TTL (seconds)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    JSON values in a local SQLite file, with TTL and size-based eviction
+    (least recently read entries go first once max_entries is exceeded).
+
+    Reads don't write: access times are collected in memory and written in
+    one batch every TOUCH_BATCH reads or TOUCH_INTERVAL seconds (best effort,
+    they only steer eviction). Blocking: async code goes through TieredCache.aget/aset.
+    """
+
+    TOUCH_BATCH = 256
+    TOUCH_INTERVAL = 30.0
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 100_000):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._flushed = time.time()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS kv_accessed ON kv(accessed)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM kv WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            if self.ttl is not None and row[1] + self.ttl < now:
+                self._db.execute("DELETE FROM kv WHERE key = ?", (key,))
+                return default
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH or now - self._flushed > self.TOUCH_INTERVAL:
+                self._flush_touches(now)
+        return json.loads(row[0])
+
+    def _flush_touches(self, now: float) -> None:
+        touched, self._touched = self._touched, {}
+        self._flushed = now
+        if not touched:
+            return
+        try:
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE kv SET accessed = ? WHERE key = ?", [(t, k) for k, t in touched.items()])
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            print(f"⚠️ Dropped {len(touched)} cache access times: {e}")
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO kv (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:  # amortise eviction
+                self._evict(now)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def _evict(self, now: float) -> None:
+        self._flush_touches(now)
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM kv WHERE created < ?", (now - self.ttl,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM kv").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM kv WHERE key IN (SELECT key FROM kv ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+
+class TieredCache:
+    """
+    In-process LRU in front of a DiskCache, with hit/miss counters. Disk
+    errors (e.g. "database is locked" while another process writes) count as
+    misses on reads and are skipped on writes.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+
+    def _disk_get(self, key: str) -> Any:
+        try:
+            return self.disk.get(key, _MISSING)
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            print(f"⚠️ Disk cache read failed, treating it as a miss: {e}")
+            return _MISSING
+
+    def _disk_set(self, key: str, value: Any) -> None:
+        try:
+            self.disk.set(key, value)
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            print(f"⚠️ Disk cache write failed, skipped: {e}")
+
+    def _memory_get(self, key: str) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self.memory_hits += 1
+        return value
+
+    def _from_disk(self, key: str, value: Any, default: Any) -> Any:
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.disk_hits += 1
+        self.memory.set(key, value)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            return value
+        return self._from_disk(key, self._disk_get(key) if self.disk is not None else _MISSING, default)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """get() for the event loop: memory hits answer inline, the disk lookup runs in a thread."""
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            return value
+        disk_value = await asyncio.to_thread(self._disk_get, key) if self.disk is not None else _MISSING
+        return self._from_disk(key, disk_value, default)
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self._disk_set(key, value)
+
+    async def aset(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self._disk_set, key, value)
+
+    def pop(self, key: str) -> None:
+        self.memory.pop(key)
+        if self.disk is not None:
+            self.disk.pop(key)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else None,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_errors": self.disk_errors,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls that share a key into one execution.
+
+    The work runs as its own task that every caller awaits through a shield:
+    a caller that is cancelled (e.g. its client disconnected) only stops
+    waiting, the others still get the result.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller had already left
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,169 @@
+import asyncio, os, time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import ollama
+    from supabase import AClient
+
+# Long-lived clients for every service we call, built on first use (the SDKs are
+# slow to import) and closed at shutdown. Each service gets one pooled,
+# keep-alive transport (HTTP/2 where the server supports it) shared by all of
+# its httpx clients, so bursts reuse connections instead of opening new ones.
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+BRIGHTDATA_API = os.getenv("BRIGHTDATA_API")
+
+# Pool defaults; override per service with e.g. SUPABASE_MAX_CONNECTIONS or OLLAMA_HTTP2.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))  # read/write/pool
+HTTP2 = os.getenv("HTTP2", "1") == "1"
+
+_transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+_counters: Dict[str, Dict[str, int]] = {}
+_supabase: Optional["AClient"] = None
+_brightdata: Any = None
+_ollama: Optional["ollama.AsyncClient"] = None
+_supabase_lock = asyncio.Lock()
+# client -> milliseconds spent importing its SDK and constructing it
+timings: Dict[str, float] = {}
+
+
+def _setting(service: str, name: str, default):
+    value = os.getenv(f"{service.upper()}_{name}")
+    if value is None:
+        return default
+    return type(default)(value == "1") if isinstance(default, bool) else type(default)(value)
+
+
+def _transport(service: str, http2: bool = HTTP2) -> httpx.AsyncHTTPTransport:
+    if service not in _transports:
+        _transports[service] = httpx.AsyncHTTPTransport(
+            http2=_setting(service, "HTTP2", http2),
+            limits=httpx.Limits(
+                max_connections=_setting(service, "MAX_CONNECTIONS", HTTP_MAX_CONNECTIONS),
+                max_keepalive_connections=_setting(service, "MAX_KEEPALIVE", HTTP_MAX_KEEPALIVE),
+                keepalive_expiry=_setting(service, "KEEPALIVE_EXPIRY", HTTP_KEEPALIVE_EXPIRY),
+            ),
+        )
+        _counters[service] = {"responses": 0, "server_errors": 0, "http2_responses": 0}
+    return _transports[service]
+
+
+def _timeout(service: str, read: Optional[float] = HTTP_TIMEOUT) -> httpx.Timeout:
+    return httpx.Timeout(
+        _setting(service, "TIMEOUT", HTTP_TIMEOUT),
+        connect=_setting(service, "CONNECT_TIMEOUT", HTTP_CONNECT_TIMEOUT),
+        read=read,
+    )
+
+
+def _client_kwargs(service: str, http2: bool = HTTP2, read_timeout: Optional[float] = HTTP_TIMEOUT) -> dict:
+    """httpx.AsyncClient arguments for the service's shared transport, with response counters for stats()."""
+    transport = _transport(service, http2)
+    counters = _counters[service]
+
+    async def on_response(response):
+        counters["responses"] += 1
+        counters["server_errors"] += response.status_code >= 500
+        counters["http2_responses"] += response.http_version == "HTTP/2"
+
+    return {"transport": transport, "timeout": _timeout(service, read_timeout), "event_hooks": {"response": [on_response]}}
+
+
+def http_client(service: str, **kwargs) -> httpx.AsyncClient:
+    return httpx.AsyncClient(**_client_kwargs(service), **kwargs)
+
+
+async def supabase() -> "AClient":
+    """
+    The async Supabase client, with its PostgREST and Storage sessions moved
+    onto the shared "supabase" transport (the SDK otherwise builds its own
+    default-configured httpx clients).
+    """
+    global _supabase
+    if _supabase is None:
+        async with _supabase_lock:
+            if _supabase is None:
+                started = time.perf_counter()
+                from supabase import acreate_client
+                client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+                postgrest, storage = client.postgrest, client.storage
+                old = [postgrest.session, storage.session]
+                postgrest.session = http_client("supabase", base_url=old[0].base_url, headers=old[0].headers)
+                storage.session = storage._client = http_client(
+                    "supabase", base_url=old[1].base_url, headers=old[1].headers, follow_redirects=True
+                )
+                for session in old:
+                    await session.aclose()
+                _supabase = client
+                timings["supabase"] = round((time.perf_counter() - started) * 1000, 1)
+    return _supabase
+
+
+async def brightdata():
+    """The BrightData datasets API client (scrape.BrightData)."""
+    global _brightdata
+    if _brightdata is None:
+        import scrape
+        _brightdata = scrape.BrightData(http_client(
+            "brightdata",
+            base_url=scrape.BRIGHTDATA_BASE_URL,
+            headers={"Authorization": f"Bearer {BRIGHTDATA_API}"},
+        ))
+    return _brightdata
+
+
+def ollama_client() -> "ollama.AsyncClient":
+    """
+    The Ollama client (honours OLLAMA_HOST). Plain HTTP/1.1 to a local server,
+    no read timeout: keywords.LLM_TIMEOUT bounds each call instead.
+    """
+    global _ollama
+    if _ollama is None:
+        started = time.perf_counter()
+        import ollama
+        _ollama = ollama.AsyncClient(**_client_kwargs("ollama", http2=False, read_timeout=None))
+        timings["ollama"] = round((time.perf_counter() - started) * 1000, 1)
+    return _ollama
+
+
+async def aclose():
+    """Closes every pooled connection; called from the app lifespan on shutdown."""
+    global _supabase, _brightdata, _ollama
+    for transport in _transports.values():
+        await transport.aclose()
+    _transports.clear()
+    _supabase = _brightdata = _ollama = None
+
+
+def _pool_stats(transport: httpx.AsyncHTTPTransport) -> dict:
+    connections = list(getattr(transport._pool, "connections", []))
+    return {
+        "connections": len(connections),
+        "idle": sum(1 for c in connections if c.is_idle()),
+        "http2": sum(1 for c in connections if "HTTP/2" in c.info()),
+    }
+
+
+def status() -> dict:
+    return {
+        "supabase": _supabase is not None,
+        "brightdata": _brightdata is not None,
+        "ollama": _ollama is not None,
+        "timings_ms": timings,
+    }
+
+
+def stats() -> dict:
+    return {
+        service: {**_counters[service], **_pool_stats(transport)}
+        for service, transport in _transports.items()
+    }
@@ -0,0 +1,248 @@
+import asyncio, hashlib, os, sqlite3, threading, unicodedata
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import keywords
+import metrics
+from cache import CACHE_DIR
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "64"))  # texts per ollama.embed call
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "60"))
+EMBED_DIR = os.path.join(CACHE_DIR, "embeddings")
+# Rows scored per step of a search (8192 x 768 float32 is 24 MiB), so memory
+# stays flat however large the store grows.
+EMBED_SEARCH_CHUNK = int(os.getenv("EMBED_SEARCH_CHUNK", "8192"))
+_INITIAL_ROWS = 1024
+
+_embed_slots = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+
+def content_hash(text: str) -> str:
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class VectorStore:
+    """
+    Unit-length float32 vectors for one embedding model in a memory-mapped
+    matrix (<dir>/vectors.f32), one row per distinct text, plus a SQLite file
+    mapping content hashes to rows and (kind, ref_id) items to rows.
+
+    Rows are only ever appended; the file doubles in size when it fills up.
+    Search is exact: a matmul over the rows of one kind, a chunk at a time.
+    That is meant for the corpus sizes of this app, up to some 100k items per
+    kind (tens of milliseconds at 768 dimensions); far beyond that an
+    approximate index would be the better fit.
+
+    Several processes (API, queue workers) can share a store: appends hold
+    SQLite's write lock, and each process picks up the others' rows and items
+    from the index before using it.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self._matrix_path = os.path.join(path, "vectors.f32")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items (kind TEXT NOT NULL, ref_id INTEGER NOT NULL, row INTEGER NOT NULL,"
+            " PRIMARY KEY (kind, ref_id))"
+        )
+        self.dim: Optional[int] = None
+        self.rows = 0
+        self._hashes: Dict[str, int] = {}
+        # kind -> {ref_id: row}
+        self._items: Dict[str, Dict[int, int]] = {}
+        self._items_seen = 0  # highest items rowid loaded
+        self._matrix: Optional[np.memmap] = None
+        self._version = None
+        self._sync()
+
+    def _sync(self) -> None:
+        """Loads rows and items other processes committed since the last call. Call with _lock held."""
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return
+        self._version = version
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        self.dim = meta.get("dim")
+        rows = meta.get("rows", 0)
+        if rows > self.rows:
+            self._hashes.update(self._db.execute("SELECT hash, row FROM vectors WHERE row >= ?", (self.rows,)))
+            self.rows = rows
+        for rowid, kind, ref_id, row in self._db.execute(
+            "SELECT rowid, kind, ref_id, row FROM items WHERE rowid > ? ORDER BY rowid", (self._items_seen,)
+        ):
+            self._items.setdefault(kind, {})[ref_id] = row
+            self._items_seen = rowid
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if self.dim and capacity < self.rows:
+            capacity = os.path.getsize(self._matrix_path) // (4 * self.dim)
+            self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _grow(self, needed: int) -> None:
+        if self._matrix is not None and needed <= self._matrix.shape[0]:
+            return
+        # the file may already have been grown by another process
+        capacity = os.path.getsize(self._matrix_path) // (4 * self.dim) if os.path.exists(self._matrix_path) else 0
+        if needed > capacity:
+            capacity = max(capacity * 2, needed, _INITIAL_ROWS)
+            if self._matrix is not None:
+                self._matrix.flush()
+            with open(self._matrix_path, "ab") as f:
+                f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def lookup(self, hashes: Sequence[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            self._sync()
+            return [np.array(self._matrix[r]) if (r := self._hashes.get(h)) is not None else None for h in hashes]
+
+    def append(self, hashes: Sequence[str], vectors: np.ndarray) -> None:
+        """Stores new (already normalized) vectors under their content hashes."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")  # other processes append after us, not over us
+            try:
+                self._sync()
+                if self.dim is None:
+                    self.dim = int(vectors.shape[1])
+                    self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (self.dim,))
+                new = list({h: v for h, v in zip(hashes, vectors) if h not in self._hashes}.items())
+                if not new:
+                    self._db.execute("COMMIT")
+                    return
+                self._grow(self.rows + len(new))
+                start = self.rows
+                for i, (h, v) in enumerate(new):
+                    self._matrix[start + i] = v
+                self._matrix.flush()
+                self._db.executemany(
+                    "INSERT INTO vectors (hash, row) VALUES (?, ?)", [(h, start + i) for i, (h, _) in enumerate(new)]
+                )
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rows', ?)", (start + len(new),))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._hashes.update((h, start + i) for i, (h, _) in enumerate(new))
+            self.rows = start + len(new)
+
+    def link(self, kind: str, ref_id: int, text_hash: str) -> None:
+        """Points an item (e.g. a saved job) at the vector of its text."""
+        with self._lock:
+            self._sync()
+            row = self._hashes[text_hash]
+            self._items.setdefault(kind, {})[ref_id] = row
+            self._db.execute("INSERT OR REPLACE INTO items (kind, ref_id, row) VALUES (?, ?, ?)", (kind, ref_id, row))
+
+    def search(self, query: np.ndarray, kind: str, k: int = 10) -> List[dict]:
+        """Top-k items of `kind` by cosine similarity to `query` (unit length)."""
+        with self._lock:
+            self._sync()
+            items = self._items.get(kind)
+            if not items or self._matrix is None:
+                return []
+            ref_ids = np.fromiter(items.keys(), dtype=np.int64, count=len(items))
+            rows = np.fromiter(items.values(), dtype=np.int64, count=len(items))
+            order = np.argsort(rows)  # read the memmap front to back
+            ref_ids, rows = ref_ids[order], rows[order]
+            best_ids, best_scores = [], []
+            for start in range(0, len(rows), EMBED_SEARCH_CHUNK):
+                scores = self._matrix[rows[start : start + EMBED_SEARCH_CHUNK]] @ query
+                top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+                best_ids.append(ref_ids[start + top])
+                best_scores.append(scores[top])
+        ids, scores = np.concatenate(best_ids), np.concatenate(best_scores)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [{"id": int(ids[i]), "score": round(float(scores[i]), 4)} for i in top]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._sync()
+        return {
+            "dim": self.dim,
+            "vectors": self.rows,
+            "capacity": self._matrix.shape[0] if self._matrix is not None else 0,
+            "items": {kind: len(items) for kind, items in self._items.items()},
+        }
+
+
+store = VectorStore(os.path.join(EMBED_DIR, EMBED_MODEL.replace(":", "_").replace("/", "_")))
+hits = 0
+misses = 0
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+async def _embed_batch(texts: List[str]) -> np.ndarray:
+    async with _embed_slots:
+        with metrics.stage("llm_embed"):
+            response = await asyncio.wait_for(
+                keywords._ollama().embed(model=EMBED_MODEL, input=texts), EMBED_TIMEOUT
+            )
+    return _normalize(np.asarray(response["embeddings"], dtype=np.float32))
+
+
+async def embed_many(texts: Sequence[Optional[str]]) -> List[Optional[np.ndarray]]:
+    """
+    Unit-length embeddings for `texts` (None for empty ones), in order.
+    Vectors are cached by content hash in `store`; only unseen texts go to
+    Ollama, in batches of EMBED_BATCH. Failures come back as None and are not cached.
+    """
+    global hits, misses
+    hashes = [content_hash(t) if t else None for t in texts]
+    found = await asyncio.to_thread(store.lookup, [h for h in hashes if h])
+    by_hash = {h: v for h, v in zip([h for h in hashes if h], found) if v is not None}
+    todo = list(dict.fromkeys((h, t) for h, t in zip(hashes, texts) if h and h not in by_hash))
+    hits += sum(1 for h in hashes if h in by_hash)
+    misses += len(todo)
+
+    batches = [todo[i:i + EMBED_BATCH] for i in range(0, len(todo), EMBED_BATCH)]
+    results = await asyncio.gather(*(_embed_batch([t for _, t in b]) for b in batches), return_exceptions=True)
+    for batch, vectors in zip(batches, results):
+        if isinstance(vectors, BaseException):
+            print(f"Ollama embedding failed: {vectors!r}")
+            continue
+        await asyncio.to_thread(store.append, [h for h, _ in batch], vectors)
+        by_hash.update((h, v) for (h, _), v in zip(batch, vectors))
+    return [by_hash.get(h) if h else None for h in hashes]
+
+
+async def index(kind: str, ref_id: int, text: Optional[str]) -> bool:
+    """Embeds `text` (cached) and makes it searchable as (kind, ref_id)."""
+    if not text or (await embed_many([text]))[0] is None:
+        return False
+    await asyncio.to_thread(store.link, kind, ref_id, content_hash(text))
+    return True
+
+
+def mean_vector(vectors: Sequence[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+    """Unit-length centroid of the non-missing vectors, e.g. all experiences of a profile."""
+    present = [v for v in vectors if v is not None]
+    if not present:
+        return None
+    return _normalize(np.mean(present, axis=0, keepdims=True))[0]
+
+
+async def search(query: np.ndarray, kind: str, k: int = 10) -> List[dict]:
+    return await asyncio.to_thread(store.search, query, kind, k)
+
+
+def stats() -> dict:
+    lookups = hits + misses
+    return {
+        "model": EMBED_MODEL,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        **store.stats(),
+    }
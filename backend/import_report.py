@@ -0,0 +1,54 @@
+"""
+Import-time report for the API module, to keep cold starts within a budget.
+
+    python import_report.py [--module api] [--top 15] [--budget-ms 800]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+prints the slowest imports by cumulative time. Exits 1 when the total is
+over the budget (IMPORT_BUDGET_MS, default 800), so it can gate deploys.
+"""
+import argparse, os, re, subprocess, sys
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if m := _LINE.match(line):
+            self_us, cumulative_us, indent, name = m.groups()
+            rows.append((name, (len(indent) - 1) // 2, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="api")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "800")))
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total = next(cum for name, depth, _, cum in rows if name == args.module and depth == 0)
+    top_level = sorted((r for r in rows if r[1] <= 1 and r[0] != args.module), key=lambda r: -r[3])
+
+    print(f"{'module':<40} {'self ms':>9} {'cumulative ms':>14}")
+    for name, depth, self_ms, cum_ms in top_level[: args.top]:
+        print(f"{'  ' * depth + name:<40} {self_ms:>9.1f} {cum_ms:>14.1f}")
+    print(f"\nimport {args.module}: {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if total > args.budget_ms:
+        print("❌ over budget")
+        sys.exit(1)
+    print("✅ within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import heapq, math, os, sqlite3, threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cache import CACHE_DIR
+from matching import normalize_term
+
+# Inverted index over saved jobs: keyword -> {job_id: weight}. Kept in memory
+# for queries and mirrored to a local SQLite file so restarts don't need a
+# full scan of the jobs table. Weights are 1/len(job terms), so a job's
+# postings sum to 1 and long keyword lists don't dominate the ranking.
+# Jobs indexed (or re-indexed) by other processes, e.g. the queue workers, are
+# picked up from the file on the next read: every write stamps the job with the
+# next value of a change sequence, and readers load what is above the last one
+# they saw (job ids alone don't work, workers commit them out of order).
+JOB_INDEX_PATH = os.getenv("JOB_INDEX_PATH", os.path.join(CACHE_DIR, "job_index.sqlite3"))
+
+_lock = threading.Lock()
+_postings: Dict[str, Dict[int, float]] = {}
+_jobs: Dict[int, Tuple[str, Optional[str], List[str]]] = {}  # job_id -> (title, company, terms)
+
+os.makedirs(os.path.dirname(JOB_INDEX_PATH), exist_ok=True)
+_db = sqlite3.connect(JOB_INDEX_PATH, check_same_thread=False, isolation_level=None)
+_db.execute("PRAGMA journal_mode=WAL")
+_db.execute(
+    "CREATE TABLE IF NOT EXISTS jobs (job_id INTEGER PRIMARY KEY, title TEXT, company TEXT, seq INTEGER NOT NULL DEFAULT 0)"
+)
+if "seq" not in {row[1] for row in _db.execute("PRAGMA table_info(jobs)")}:  # files from before the sequence
+    try:
+        _db.execute("ALTER TABLE jobs ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+    except sqlite3.OperationalError as e:
+        if "duplicate column" not in str(e):  # another process added it first
+            raise
+_db.execute("CREATE INDEX IF NOT EXISTS jobs_seq ON jobs(seq)")
+_db.execute(
+    "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, job_id INTEGER NOT NULL, weight REAL NOT NULL,"
+    " PRIMARY KEY (term, job_id))"
+)
+_db.execute("CREATE INDEX IF NOT EXISTS postings_job ON postings(job_id)")
+
+
+def _unlink(job_id: int) -> None:
+    old = _jobs.pop(job_id, None)
+    for term in old[2] if old else ():
+        posting = _postings.get(term)
+        if posting is not None:
+            posting.pop(job_id, None)
+            if not posting:
+                del _postings[term]
+
+
+def _load() -> None:
+    """Loads the jobs written since the last load (new and re-indexed ones alike)."""
+    global _seen
+    own = not _db.in_transaction  # add() calls this inside its write transaction
+    if own:
+        _db.execute("BEGIN")  # one snapshot for both reads
+    try:
+        jobs = _db.execute("SELECT job_id, title, company, seq FROM jobs WHERE seq > ? ORDER BY seq", (_seen,)).fetchall()
+        postings = _db.execute(
+            "SELECT p.term, p.job_id, p.weight FROM postings p JOIN jobs j ON j.job_id = p.job_id WHERE j.seq > ?",
+            (_seen,),
+        ).fetchall()
+    finally:
+        if own:
+            _db.execute("COMMIT")
+    for job_id, title, company, seq in jobs:
+        _unlink(job_id)
+        _jobs[job_id] = (title, company, [])
+        _seen = seq
+    for term, job_id, weight in postings:
+        _postings.setdefault(term, {})[job_id] = weight
+        _jobs[job_id][2].append(term)
+
+
+def _sync() -> None:
+    """Loads jobs another process committed since the last call. Call with _lock held."""
+    global _version
+    version = _db.execute("PRAGMA data_version").fetchone()[0]
+    if version != _version:
+        _version = version
+        _load()
+
+
+_version = None
+_seen = -1  # highest change sequence loaded
+_sync()
+
+
+def add(job_id: int, title: Optional[str], company: Optional[str], keywords: Sequence[str]) -> None:
+    """Indexes (or re-indexes) one job. Blocking: run it off the event loop."""
+    terms = list(dict.fromkeys(t for t in map(normalize_term, keywords) if t))
+    weight = 1.0 / len(terms) if terms else 0.0
+    global _seen
+    with _lock:
+        _db.execute("BEGIN IMMEDIATE")  # holds the write lock, so sequence numbers follow commit order
+        try:
+            _sync()
+            (seq,) = _db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs").fetchone()
+            _db.execute("DELETE FROM postings WHERE job_id = ?", (job_id,))
+            _db.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, title, company, seq) VALUES (?, ?, ?, ?)",
+                (job_id, title, company, seq),
+            )
+            _db.executemany(
+                "INSERT INTO postings (term, job_id, weight) VALUES (?, ?, ?)", [(t, job_id, weight) for t in terms]
+            )
+            _db.execute("COMMIT")
+        except BaseException:
+            _db.execute("ROLLBACK")
+            raise
+        _seen = seq  # everything below it was loaded by the _sync() above
+        _unlink(job_id)
+        _jobs[job_id] = (title, company, terms)
+        for term in terms:
+            _postings.setdefault(term, {})[job_id] = weight
+
+
+def add_many(rows: Iterable[dict]) -> int:
+    """Indexes rows of the jobs table ({id, title, company, keywords}); returns how many."""
+    count = 0
+    for row in rows:
+        add(row["id"], row.get("title"), row.get("company"), row.get("keywords") or [])
+        count += 1
+    return count
+
+
+def get(job_id: int) -> Optional[dict]:
+    with _lock:
+        _sync()
+        job = _jobs.get(job_id)
+    return {"job_id": job_id, "title": job[0], "company": job[1]} if job else None
+
+
+def top_jobs(profile_weights: Dict[str, float], k: int = 10) -> List[dict]:
+    """
+    Top-k saved jobs for a profile's terms (see matching.profile_terms).
+
+    Only the postings of the profile's own terms are visited: each matching
+    job accumulates idf(term) * weight, where idf is smoothed over every
+    indexed job so terms most jobs ask for count less.
+    """
+    with _lock:
+        _sync()
+        n_jobs = len(_jobs)
+        scores: Dict[int, float] = {}
+        matched: Dict[int, List[str]] = {}
+        for term in profile_weights:
+            posting = _postings.get(term)
+            if not posting:
+                continue
+            idf = math.log((1 + n_jobs) / (1 + len(posting))) + 1.0
+            for job_id, weight in posting.items():
+                scores[job_id] = scores.get(job_id, 0.0) + idf * weight
+                matched.setdefault(job_id, []).append(term)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            {
+                "job_id": job_id,
+                "title": _jobs[job_id][0],
+                "company": _jobs[job_id][1],
+                "score": round(score, 4),
+                "matched": matched[job_id],
+            }
+            for job_id, score in best
+        ]
+
+
+def document_frequencies(terms: Iterable[str]) -> Tuple[int, Dict[str, int]]:
+    """(number of indexed jobs, {term: jobs listing it}) for normalized `terms`, e.g. IDF for matching.score_jobs."""
+    with _lock:
+        _sync()
+        return len(_jobs), {t: len(_postings.get(t, ())) for t in set(terms)}
+
+
+def stats() -> dict:
+    with _lock:
+        _sync()
+    return {"jobs": len(_jobs), "terms": len(_postings), "path": JOB_INDEX_PATH}
@@ -0,0 +1,196 @@
+import asyncio, hashlib, os, time, unicodedata
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Sequence
+
+import clients
+import metrics
+from cache import CACHE_DIR, DiskCache, LRUCache, TieredCache
+
+if TYPE_CHECKING:
+    import ollama
+
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+# How many ollama.chat calls may be in flight at once. The Ollama server only runs
+# them in parallel if it was started with OLLAMA_NUM_PARALLEL >= this value.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # seconds, per call
+
+KEYWORD_CACHE_TTL = float(os.getenv("KEYWORD_CACHE_TTL", str(30 * 24 * 3600)))
+KEYWORD_CACHE_MEMORY = int(os.getenv("KEYWORD_CACHE_MEMORY", "4096"))
+KEYWORD_CACHE_MAX_ENTRIES = int(os.getenv("KEYWORD_CACHE_MAX_ENTRIES", "200000"))
+
+RESUME_PROMPT = (
+    "Extract 5 to 10 relevant, concise professional keywords "
+    "from this resume. EACH KEYWORD SHOULD ONLY BE SEPARATED BY A COMMA, NO SPACE AFTER.\n\n"
+)
+JOB_DESC_PROMPT = RESUME_PROMPT
+BULLET_PROMPT = (
+    "Rewrite this resume entry as 2 to 4 concise achievement bullets that highlight these job keywords "
+    "where they honestly apply: {keywords}. ONE BULLET PER LINE, NO NUMBERING, NO OTHER TEXT.\n\n"
+)
+# Bump when a prompt (or parse_keywords) changes so stale cache entries stop matching.
+PROMPT_VERSION = "1"
+
+cache = TieredCache(
+    LRUCache(maxsize=KEYWORD_CACHE_MEMORY, ttl=KEYWORD_CACHE_TTL),
+    DiskCache(os.path.join(CACHE_DIR, "keywords.sqlite3"), ttl=KEYWORD_CACHE_TTL, max_entries=KEYWORD_CACHE_MAX_ENTRIES),
+)
+
+_llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+
+
+def _ollama() -> "ollama.AsyncClient":
+    return clients.ollama_client()
+
+
+def parse_keywords(raw: str) -> List[str]:
+    # clean and split into list
+    return [kw.strip() for kw in (raw or "").replace("\n", ",").split(",") if kw.strip()]
+
+
+def cache_key(kind: str, model: str, text: str) -> str:
+    """Content address for an extraction: (model, prompt version, normalized text hash)."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{kind}:{model}:v{PROMPT_VERSION}:{digest}"
+
+
+async def _extract(text: Optional[str], prompt: str, model: str, kind: str) -> List[str]:
+    if not text:
+        return []
+    key = cache_key(kind, model, text)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return cached
+    try:
+        async with _llm_slots:
+            with metrics.stage("llm_extract"):
+                response = await asyncio.wait_for(
+                    _ollama().chat(model=model, messages=[{"role": "user", "content": prompt + text}]),
+                    LLM_TIMEOUT,
+                )
+        keywords = parse_keywords(response["message"]["content"])
+        await cache.aset(key, keywords)  # failures below are not cached
+        return keywords
+    except asyncio.TimeoutError:
+        print(f"Ollama keyword extraction timed out after {LLM_TIMEOUT}s")
+        return []
+    except Exception as e:
+        print(f"Ollama keyword extraction failed: {e}")
+        return []
+
+
+async def _stream_chat(model: str, content: str) -> AsyncIterator[str]:
+    """Yields the text of an ollama.chat(stream=True) reply as it arrives; LLM_TIMEOUT applies per chunk."""
+    async with _llm_slots:
+        first = True
+        started = time.perf_counter()
+        chunks = await _ollama().chat(model=model, messages=[{"role": "user", "content": content}], stream=True)
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), LLM_TIMEOUT)
+            except StopAsyncIteration:
+                metrics.record("llm_stream", time.perf_counter() - started)
+                return
+            if first:
+                metrics.record("llm_first_token", time.perf_counter() - started)
+                first = False
+            yield chunk["message"]["content"]
+
+
+def _split(text: str, separators: str) -> List[str]:
+    for sep in separators[1:]:
+        text = text.replace(sep, separators[0])
+    return text.split(separators[0])
+
+
+async def _stream_items(key: str, chunks: AsyncIterator[str], separators: str, clean=str.strip) -> AsyncIterator[str]:
+    """
+    Splits streamed text into items as soon as each one is terminated by a
+    separator, yielding them one by one. The full list is cached under `key`
+    only if the stream completes.
+    """
+    items, buffer = [], ""
+    async for text in chunks:
+        buffer += text
+        *done, buffer = _split(buffer, separators)
+        for item in filter(None, map(clean, done)):
+            items.append(item)
+            yield item
+    if item := clean(buffer):
+        items.append(item)
+        yield item
+    await cache.aset(key, items)
+
+
+async def stream_keywords(text: Optional[str], kind: str = "job", model: str = OLLAMA_MODEL) -> AsyncIterator[str]:
+    """
+    Streaming variant of extract_keywords_from_*: yields each keyword as soon
+    as the model has finished writing it. Shares the cache with the
+    non-streaming calls, so cached texts come back at once.
+    """
+    if not text:
+        return
+    prompt = JOB_DESC_PROMPT if kind == "job" else RESUME_PROMPT
+    key = cache_key(kind, model, text)
+    cached = await cache.aget(key)
+    if cached is not None:
+        for kw in cached:
+            yield kw
+        return
+    try:
+        async for kw in _stream_items(key, _stream_chat(model, prompt + text), ",\n"):
+            yield kw
+    except asyncio.TimeoutError:
+        print(f"Ollama keyword stream stalled for {LLM_TIMEOUT}s")
+    except Exception as e:
+        print(f"Ollama keyword stream failed: {e}")
+
+
+def _clean_bullet(line: str) -> str:
+    return line.strip().lstrip("-•*").strip()
+
+
+async def stream_bullets(description: Optional[str], job_keywords: Sequence[str],
+                         model: str = OLLAMA_MODEL) -> AsyncIterator[str]:
+    """Rewrites one experience description into bullets aimed at `job_keywords`, yielding each finished line."""
+    if not description:
+        return
+    prompt = BULLET_PROMPT.format(keywords=", ".join(job_keywords) or "none given")
+    key = cache_key("bullets", model, prompt + description)
+    cached = await cache.aget(key)
+    if cached is not None:
+        for bullet in cached:
+            yield bullet
+        return
+    try:
+        async for bullet in _stream_items(key, _stream_chat(model, prompt + description), "\n", _clean_bullet):
+            yield bullet
+    except asyncio.TimeoutError:
+        print(f"Ollama bullet stream stalled for {LLM_TIMEOUT}s")
+    except Exception as e:
+        print(f"Ollama bullet stream failed: {e}")
+
+
+async def extract_keywords_from_resume(text: Optional[str], model: str = OLLAMA_MODEL) -> List[str]:
+    """
+    Uses a local Ollama model to extract key skills or technologies
+    mentioned in a resume entry. Returns a list of short keywords.
+    """
+    return await _extract(text, RESUME_PROMPT, model, "resume")
+
+
+async def extract_keywords_from_job_desc(text: Optional[str], model: str = OLLAMA_MODEL) -> List[str]:
+    """
+    Uses a local Ollama model to extract key skills or technologies
+    mentioned in a job description. Returns a list of short keywords.
+    """
+    return await _extract(text, JOB_DESC_PROMPT, model, "job")
+
+
+async def extract_keywords_many(texts: List[Optional[str]], model: str = OLLAMA_MODEL) -> List[List[str]]:
+    """
+    Fans resume entries out concurrently (at most LLM_CONCURRENCY in flight,
+    LLM_TIMEOUT each), so latency tracks the slowest call rather than the sum.
+    Results keep the order of `texts`.
+    """
+    return list(await asyncio.gather(*(extract_keywords_from_resume(t, model) for t in texts)))
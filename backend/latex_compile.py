@@ -0,0 +1,254 @@
+import asyncio, fcntl, math, os, random, re, shutil, time
+from typing import List, Optional, Set
+
+from fastapi import HTTPException
+
+import metrics
+from cache import CACHE_DIR
+
+# Tectonic keeps downloaded bundle files and generated format files (.fmt) in its
+# cache dir. Pinning it to a persistent location and warming it once with our
+# preamble means later runs never re-resolve the bundle or rebuild the format.
+TECTONIC_BIN = os.getenv("TECTONIC_BIN", "tectonic")  # name on PATH, or a path
+TECTONIC_CACHE_DIR = os.getenv("TECTONIC_CACHE_DIR", os.path.join(CACHE_DIR, "tectonic"))
+WORKDIR_ROOT = os.path.join(CACHE_DIR, "tectonic-work")
+# One reusable work directory per concurrent compile, sized for the host: every
+# API process (uvicorn --workers) shares the same set, and a compile holds the
+# directory's <i>.lock file, so this caps tectonic processes on the machine.
+COMPILE_CONCURRENCY = int(os.getenv("COMPILE_CONCURRENCY", str(os.cpu_count() or 2)))
+# Compiles allowed to wait for a work directory, host-wide (each waiter holds one
+# of the queue/<j>.lock tickets); beyond that callers get 503 + Retry-After right
+# away instead of queueing into ever longer latencies.
+COMPILE_QUEUE_MAX = int(os.getenv("COMPILE_QUEUE_MAX", str(4 * COMPILE_CONCURRENCY)))
+COMPILE_POLL_MAX = 0.1  # seconds between a waiter's tries for a free work directory
+
+# A missing file under --only-cached is worth a second, networked run; any other
+# failure (a broken document) is not.
+_CACHE_MISS = re.compile(r"File `[^']*' not found|not (?:available|found) in (?:the )?cache|only.cached", re.I)
+
+_waiting = 0  # in this process
+rejected = 0
+_queue_wait = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+_warm = False
+_timings = {
+    "cold": {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": None},
+    "warm": {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": None},
+}
+warmup_ms: Optional[float] = None
+
+
+def _lock_fds(directory: str, n: int) -> List[int]:
+    os.makedirs(directory, exist_ok=True)
+    return [os.open(os.path.join(directory, f"{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644) for i in range(n)]
+
+
+# flock is per open file, so one fd per slot is shared by this process's callers;
+# _held keeps them from taking the same slot twice.
+_slot_fds = _lock_fds(WORKDIR_ROOT, COMPILE_CONCURRENCY)
+_ticket_fds = _lock_fds(os.path.join(WORKDIR_ROOT, "queue"), COMPILE_QUEUE_MAX)
+_held: Set[int] = set()
+_held_tickets: Set[int] = set()
+for i in range(COMPILE_CONCURRENCY):
+    os.makedirs(os.path.join(WORKDIR_ROOT, str(i)), exist_ok=True)
+
+
+def _try_take(fds: List[int], held: Set[int]) -> Optional[int]:
+    """Index of a lock in `fds` this process now holds, or None if all are taken (never blocks)."""
+    start = random.randrange(len(fds)) if fds else 0
+    for k in range(len(fds)):
+        i = (start + k) % len(fds)
+        if i in held:
+            continue
+        try:
+            fcntl.flock(fds[i], fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            continue
+        held.add(i)
+        return i
+    return None
+
+
+def _give_back(fds: List[int], held: Set[int], i: int) -> None:
+    fcntl.flock(fds[i], fcntl.LOCK_UN)
+    held.discard(i)
+
+
+def available() -> bool:
+    return shutil.which(TECTONIC_BIN) is not None
+
+
+def _tectonic() -> str:
+    if not (sh := shutil.which(TECTONIC_BIN)):
+        raise HTTPException(status_code=500, detail="Tectonic not found on server PATH. Please install it.")
+    return sh
+
+
+def _clear(workdir: str) -> None:
+    """Empties a work directory, so no .aux/.out/.log of the previous document carries over."""
+    for entry in os.scandir(workdir):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+
+
+def _record(kind: str, ms: float):
+    t = _timings[kind]
+    t["count"] += 1
+    t["total_ms"] += ms
+    t["max_ms"] = max(t["max_ms"], ms)
+    t["last_ms"] = round(ms, 1)
+
+
+async def _run(sh: str, workdir: str, only_cached: bool, timeout_seconds: int):
+    cmd = [sh, "--keep-intermediates", "--outdir", workdir]
+    if only_cached:
+        cmd.append("--only-cached")
+    cmd.append(os.path.join(workdir, "main.tex"))
+    # Run tectonic (no shell-escape)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, "TECTONIC_CACHE_DIR": TECTONIC_CACHE_DIR},
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout_seconds)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise HTTPException(status_code=504, detail="LaTeX compilation timed out.")
+    return proc.returncode, stdout.decode(errors="replace") + "\n" + stderr.decode(errors="replace")
+
+
+def _retry_after() -> int:
+    """Seconds until a rejected caller likely finds room: a full queue drained at the average compile time."""
+    t = _timings["warm" if _warm else "cold"]
+    avg_s = t["total_ms"] / t["count"] / 1000 if t["count"] else 1.0
+    return max(1, math.ceil(avg_s * (COMPILE_QUEUE_MAX + 1) / COMPILE_CONCURRENCY))
+
+
+def _record_wait(waited: float) -> None:
+    metrics.record("tectonic_queue_wait", waited)
+    _queue_wait["count"] += 1
+    _queue_wait["total_ms"] += waited * 1000
+    _queue_wait["max_ms"] = max(_queue_wait["max_ms"], waited * 1000)
+
+
+async def _acquire_slot() -> int:
+    """
+    Takes a free work directory on this host; when there is none, waits for one
+    holding a queue ticket (503 + Retry-After if every ticket is taken).
+    """
+    global _waiting, rejected
+    slot = _try_take(_slot_fds, _held)
+    if slot is not None:
+        _record_wait(0.0)
+        return slot
+    ticket = _try_take(_ticket_fds, _held_tickets)
+    if ticket is None:
+        rejected += 1
+        metrics.REJECTED.labels("tectonic").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="PDF compiler is busy, try again shortly.",
+            headers={"Retry-After": str(_retry_after())},
+        )
+    started = time.perf_counter()
+    _waiting += 1
+    metrics.QUEUE_DEPTH.labels("tectonic").set(_waiting)
+    try:
+        delay = 0.005
+        while (slot := _try_take(_slot_fds, _held)) is None:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, COMPILE_POLL_MAX)
+    finally:
+        _give_back(_ticket_fds, _held_tickets, ticket)
+        _waiting -= 1
+        metrics.QUEUE_DEPTH.labels("tectonic").set(_waiting)
+    _record_wait(time.perf_counter() - started)
+    return slot
+
+
+async def compile_latex(latex_source: str, timeout_seconds: int = 20, output_path: Optional[str] = None) -> Optional[bytes]:
+    """
+    Compiles LaTeX to PDF in one of the host's reusable work directories,
+    waiting for one if all are busy (503 when COMPILE_QUEUE_MAX callers on
+    the host already wait). Returns the PDF bytes, or with `output_path`
+    moves the file there and returns None.
+    """
+    sh = _tectonic()
+    warm = _warm
+    slot = await _acquire_slot()
+    workdir = os.path.join(WORKDIR_ROOT, str(slot))
+    try:
+        tex_path = os.path.join(workdir, "main.tex")
+        pdf_path = os.path.join(workdir, "main.pdf")
+        _clear(workdir)
+        with open(tex_path, "w", encoding="utf-8") as f:
+            f.write(latex_source)
+
+        started = time.perf_counter()
+        returncode, log = await _run(sh, workdir, warm, timeout_seconds)
+        if warm and returncode != 0 and _CACHE_MISS.search(log):
+            # the document needs something outside the warmed cache: fetch it
+            returncode, log = await _run(sh, workdir, False, timeout_seconds)
+        elapsed = time.perf_counter() - started
+        _record("warm" if warm else "cold", elapsed * 1000)
+        metrics.record("tectonic_compile", elapsed, "ok" if returncode == 0 else "error")
+
+        if returncode != 0 or not os.path.exists(pdf_path):
+            raise HTTPException(status_code=400, detail=f"LaTeX compilation failed.\n{log}")
+
+        if output_path is not None:
+            shutil.move(pdf_path, output_path)  # a rename when both are under CACHE_DIR
+            return None
+        with open(pdf_path, "rb") as f:
+            return f.read()
+    finally:
+        _give_back(_slot_fds, _held, slot)
+
+
+async def warm_up(*preambles: str, timeout_seconds: int = 300):
+    """
+    Compiles a stub document with each of our preambles so the bundle files and
+    the LaTeX format are in TECTONIC_CACHE_DIR; later compiles run --only-cached.
+    """
+    global warmup_ms, _warm
+    if _warm:
+        return
+    started = time.perf_counter()
+    try:
+        for preamble in preambles:
+            await compile_latex(preamble + "\n\\begin{document}\nwarm-up\n\\end{document}\n", timeout_seconds)
+    except HTTPException as e:
+        print(f"⚠️ Tectonic warm-up failed: {e.detail}")
+        return
+    warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+    _warm = True
+    print(f"✅ Tectonic cache warmed in {warmup_ms} ms")
+
+
+def stats() -> dict:
+    timings = {
+        kind: {**t, "total_ms": round(t["total_ms"], 1), "max_ms": round(t["max_ms"], 1),
+               "avg_ms": round(t["total_ms"] / t["count"], 1) if t["count"] else None}
+        for kind, t in _timings.items()
+    }
+    return {
+        "warmed": _warm,
+        "warmup_ms": warmup_ms,
+        "cache_dir": TECTONIC_CACHE_DIR,
+        "concurrency": COMPILE_CONCURRENCY,
+        "busy_here": len(_held),
+        "waiting_here": _waiting,
+        "queue_max": COMPILE_QUEUE_MAX,
+        "rejected": rejected,
+        "queue_wait": {
+            **_queue_wait,
+            "total_ms": round(_queue_wait["total_ms"], 1),
+            "max_ms": round(_queue_wait["max_ms"], 1),
+            "avg_ms": round(_queue_wait["total_ms"] / _queue_wait["count"], 1) if _queue_wait["count"] else None,
+        },
+        **timings,
+    }
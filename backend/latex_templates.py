@@ -0,0 +1,141 @@
+import hashlib, os, re
+from typing import Dict, List, Optional, Sequence
+
+from cache import LRUCache, TieredCache
+
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "8192"))
+
+_ESCAPES = str.maketrans({
+    "&": r"\&", "%": r"\%", "$": r"\$", "#": r"\#", "_": r"\_", "{": r"\{", "}": r"\}",
+    "~": r"\textasciitilde{}", "^": r"\textasciicircum{}", "\\": r"\textbackslash{}",
+})
+
+
+def escape(s: Optional[str]) -> str:
+    return (s or "").translate(_ESCAPES)
+
+
+_COMMON = r"""
+\usepackage{hyperref}
+\usepackage{enumitem}
+\usepackage{titlesec}
+\setlength{\parskip}{4pt}
+""".strip()
+
+# Same three layouts as the popup's toLatex. Each preamble is constant so the
+# tectonic cache (see latex_compile) stays warm for it.
+PREAMBLES = {
+    "classic": rf"""
+\documentclass[10pt,a4paper]{{article}}
+\usepackage[margin=1.6cm]{{geometry}}
+{_COMMON}
+\titleformat*{{\section}}{{\large\bfseries}}
+\newcommand{{\entry}}[4]{{\noindent\textbf{{#2}} \hfill {{\small #1}}\\\textit{{#3}}\\#4\vspace{{6pt}}}}
+""".strip(),
+    # sans-serif via helvet rather than fontspec + a system font the server may not have
+    "modern": rf"""
+\documentclass[10pt,a4paper]{{article}}
+\usepackage[margin=1.4cm]{{geometry}}
+\usepackage[scaled]{{helvet}}
+\renewcommand{{\familydefault}}{{\sfdefault}}
+{_COMMON}
+\titleformat*{{\section}}{{\large\bfseries}}
+\newcommand{{\entry}}[4]{{\noindent\textbf{{#2}} \hfill {{\small #1}}\\\textit{{#3}}\\#4\vspace{{6pt}}}}
+""".strip(),
+    # article has no 9pt option; \small over the whole body gets the same density
+    "compact": rf"""
+\documentclass[10pt,a4paper]{{article}}
+\usepackage[margin=1.2cm]{{geometry}}
+{_COMMON}
+\AtBeginDocument{{\small}}
+\titleformat*{{\section}}{{\normalsize\bfseries}}
+\newcommand{{\entry}}[4]{{\noindent\textbf{{#2}} \hfill {{\small #1}}\\\textit{{#3}}\\#4\vspace{{4pt}}}}
+""".strip(),
+}
+
+_BODY = r"""
+\begin{document}
+\begin{center}
+{\Huge <<name>>}\\[2pt]
+{\small <<headline>>}\\
+\vspace{4pt}\hrule\vspace{8pt}
+\end{center}
+
+\section*{Target Role}
+<<job_title>> at <<job_company>>
+
+\section*{Profile}
+<<about>>
+
+\section*{Experience}
+<<experiences>>
+
+\section*{Keywords match}
+<<job_desc>>...
+
+\end{document}
+""".strip()
+
+_FIELD = re.compile(r"<<(\w+)>>")
+
+
+class Template:
+    """
+    A preamble plus the document body split once into literal and field
+    parts, so rendering is a single join with no parsing or formatting.
+    """
+
+    def __init__(self, name: str, preamble: str, body: str = _BODY):
+        self.name = name
+        self.preamble = preamble
+        # even indices are literals, odd ones field names
+        self._parts: List[str] = _FIELD.split(f"{preamble}\n\n{body}")
+        self._fields = self._parts[1::2]
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = self._parts[:]
+        parts[1::2] = [values[f] for f in self._fields]
+        return "".join(parts)
+
+
+TEMPLATES: Dict[str, Template] = {name: Template(name, preamble) for name, preamble in PREAMBLES.items()}
+DEFAULT_TEMPLATE = "classic"
+
+# Rendered \entry fragments by content hash; identical experiences across tailored variants render once.
+fragments = TieredCache(LRUCache(maxsize=FRAGMENT_CACHE_SIZE))
+
+
+def get(name: Optional[str]) -> Optional[Template]:
+    return TEMPLATES.get(name or DEFAULT_TEMPLATE)
+
+
+def experience_fragment(dates: str, title: Optional[str], company: Optional[str], description: Optional[str]) -> str:
+    key = hashlib.sha256("\x1f".join((dates, title or "", company or "", description or "")).encode("utf-8")).hexdigest()
+    fragment = fragments.get(key)
+    if fragment is None:
+        fragment = f"\\entry{{{escape(dates)}}}{{{escape(title)}}}{{{escape(company)}}}{{\n  {escape(description)}\n}}"
+        fragments.set(key, fragment)
+    return fragment
+
+
+def render(template: Template, name: Optional[str], headline: Optional[str], about: Optional[str],
+           experiences: Sequence[str], job_title: Optional[str], job_company: Optional[str],
+           job_desc: Optional[str]) -> str:
+    """`experiences` are fragments from experience_fragment, already escaped."""
+    return template.render({
+        "name": escape(name or "Name"),
+        "headline": escape(headline),
+        "about": escape(about),
+        "experiences": "\n\n".join(experiences) or "N/A",
+        "job_title": escape(job_title),
+        "job_company": escape(job_company),
+        "job_desc": escape((job_desc or "")[:400]),
+    })
+
+
+def preambles() -> List[str]:
+    return [t.preamble for t in TEMPLATES.values()]
+
+
+def stats() -> dict:
+    return {"templates": list(TEMPLATES), "fragment_cache": fragments.stats()}
@@ -0,0 +1,104 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+MAX_MISSING = 10  # missing skills returned per job
+
+_PUNCT = re.compile(r"[^\w+#./ -]+")
+_SPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"\.(?=\s|$)")
+
+
+def normalize_term(term: str) -> str:
+    """'  Python3, ' -> 'python3'; keeps symbols that matter in tech terms (c++, c#, node.js)."""
+    term = _SPACE.sub(" ", _PUNCT.sub(" ", (term or "").lower())).strip(" .-/")
+    return term
+
+
+def profile_terms(skills: Sequence[str], experience_keywords: Sequence[Sequence[str]]) -> Dict[str, float]:
+    """
+    Term weights for a profile: skills count once, and each experience that
+    mentions a keyword adds to it (capped later, so presence is what matters).
+    """
+    weights: Dict[str, float] = {}
+    for term in skills:
+        if t := normalize_term(term):
+            weights[t] = weights.get(t, 0.0) + 1.0
+    for keywords in experience_keywords:
+        for term in set(map(normalize_term, keywords)):
+            if term:
+                weights[term] = weights.get(term, 0.0) + 1.0
+    return weights
+
+
+def job_terms(keywords: Sequence[str], desc: Optional[str], vocabulary: Sequence[str]) -> List[str]:
+    """
+    A job's terms are its extracted keywords. Only if there are none (e.g.
+    extraction failed) does it fall back to the profile vocabulary terms that
+    appear in the description; those are all covered by definition, so such
+    a job can't report missing terms.
+    """
+    terms = [t for t in map(normalize_term, keywords) if t]
+    if terms or not desc:
+        return list(dict.fromkeys(terms))
+    text = f" {_SENTENCE_END.sub(' ', normalize_term(desc))} "
+    return [t for t in vocabulary if f" {t} " in text]
+
+
+def score_jobs(profile_weights: Dict[str, float], jobs_terms: List[List[str]],
+               doc_freq: Dict[str, int], n_docs: int) -> List[dict]:
+    """
+    Scores one profile against many jobs in one vectorized pass.
+
+    Every job is a TF-IDF row over the union vocabulary. IDF comes from the
+    saved-job corpus (`doc_freq` of `n_docs` jobs, see job_index.document_frequencies),
+    smoothed, so skills most jobs ask for weigh less than rare ones and a
+    job's score doesn't depend on which other jobs were sent with it. The
+    score is the IDF-weighted share of the job's terms the profile covers,
+    in [0, 100]; missing terms are the uncovered ones by weight.
+    """
+    from scipy import sparse  # heavy; only /api/match needs it
+
+    vocab: Dict[str, int] = {}
+    rows, cols = [], []
+    for i, terms in enumerate(jobs_terms):
+        for t in terms:
+            rows.append(i)
+            cols.append(vocab.setdefault(t, len(vocab)))
+    for t in profile_weights:
+        vocab.setdefault(t, len(vocab))
+    n_jobs, n_terms = len(jobs_terms), max(len(vocab), 1)
+
+    tf = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_jobs, n_terms))
+    tf.sum_duplicates()
+    tf.data[:] = 1.0  # a keyword listed twice is still one requirement
+    df = np.zeros(n_terms, dtype=np.float32)
+    for t, c in vocab.items():
+        df[c] = doc_freq.get(t, 0)
+    idf = (np.log((1 + n_docs) / (1 + df)) + 1.0).astype(np.float32)
+    jobs = tf.multiply(idf).tocsr()
+
+    covered = np.zeros(n_terms, dtype=np.float32)
+    for t, w in profile_weights.items():
+        covered[vocab[t]] = min(w, 1.0)
+
+    totals = np.asarray(jobs.sum(axis=1)).ravel()
+    hits = jobs @ covered
+    scores = np.divide(hits, totals, out=np.zeros_like(hits), where=totals > 0) * 100
+
+    terms_by_col = np.empty(n_terms, dtype=object)
+    for t, c in vocab.items():
+        terms_by_col[c] = t
+    results = []
+    for i in range(n_jobs):
+        start, end = jobs.indptr[i], jobs.indptr[i + 1]
+        cols_i, weights_i = jobs.indices[start:end], jobs.data[start:end]
+        miss = covered[cols_i] == 0
+        order = np.argsort(-weights_i[miss], kind="stable")[:MAX_MISSING]
+        results.append({
+            "score": round(float(scores[i]), 1),
+            "matched": [terms_by_col[c] for c in cols_i[~miss]],
+            "missing": [terms_by_col[c] for c in cols_i[miss][order]],
+        })
+    return results
@@ -0,0 +1,115 @@
+import contextvars, glob, os, time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from cache import CACHE_DIR
+
+# The pipeline runs in several processes (uvicorn workers, queue workers), so
+# samples go to files in a shared directory that /metrics aggregates. This has
+# to be set before prometheus_client is imported; set it to "" to keep
+# metrics in-process (single process only).
+MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(CACHE_DIR, "prometheus"))
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+# Per-stage latency: a Prometheus histogram per stage (scrape calls, LLM calls,
+# DB queries, LaTeX render, tectonic, storage) and, for the request that ran
+# it, a Server-Timing entry. The current request's timings live in a
+# contextvar; tasks spawned during the request inherit (and share) the dict.
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram("resumk_stage_seconds", "Time spent per pipeline stage", ["stage", "outcome"], buckets=_BUCKETS)
+REQUEST_SECONDS = Histogram("resumk_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=_BUCKETS)
+# Admission control (e.g. the tectonic compile queue)
+QUEUE_DEPTH = Gauge("resumk_queue_depth", "Callers waiting for a slot", ["stage"], multiprocess_mode="livesum")
+REJECTED = Counter("resumk_rejected_total", "Calls turned away because the queue was full", ["stage"])
+
+# stage -> [total ms, calls]
+_request_timings: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request() -> contextvars.Token:
+    return _request_timings.set({})
+
+
+def end_request(token: contextvars.Token) -> Dict[str, List[float]]:
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+    return timings
+
+
+def record(name: str, seconds: float, outcome: str = "ok") -> None:
+    STAGE_SECONDS.labels(name, outcome).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds * 1000
+        entry[1] += 1
+
+
+@contextmanager
+def stage(name: str):
+    """Times the block as `name`; works in sync and async code (`with stage("db_insert_job"): await ...`)."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        record(name, time.perf_counter() - started, outcome)
+
+
+def server_timing(timings: Dict[str, List[float]], total_ms: float) -> str:
+    entries = [f'{name};dur={ms:.1f};desc="{calls} call{"s" if calls != 1 else ""}"'
+               for name, (ms, calls) in timings.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def prune_dead() -> int:
+    """
+    Removes the sample files of processes that are gone (a previous run, a
+    crashed worker); called at process start. Returns how many were removed.
+    """
+    if not MULTIPROC_DIR:
+        return 0
+    from prometheus_client import multiprocess
+    removed = 0
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, "*.db")):
+        try:
+            pid = int(os.path.basename(path)[:-3].rsplit("_", 1)[1])
+        except (IndexError, ValueError):
+            continue
+        if _alive(pid):
+            continue
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass  # another process pruned it first
+    return removed
+
+
+def exposition() -> tuple:
+    """(body, content type) for /metrics. With PROMETHEUS_MULTIPROC_DIR set, aggregates all processes."""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
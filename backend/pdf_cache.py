@@ -0,0 +1,111 @@
+import asyncio, hashlib, os, threading, uuid
+from typing import Optional, Tuple
+
+import latex_compile
+from cache import CACHE_DIR, SingleFlight
+
+# Compiled PDFs addressed by the sha256 of their LaTeX source, compiled straight
+# into this directory and served from it as files (never read into memory). File
+# mtimes double as the LRU clock: reads touch the file, eviction removes the
+# oldest first, so a file that was just handed out is the last to go.
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(CACHE_DIR, "pdf"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+
+_lock = threading.Lock()
+_flight = SingleFlight()
+hits = 0
+misses = 0
+
+
+def _scan() -> int:
+    return sum(e.stat().st_size for e in os.scandir(PDF_CACHE_DIR) if e.name.endswith(".pdf"))
+
+
+_total_bytes = _scan()
+
+
+def key_for(latex_source: str) -> str:
+    return hashlib.sha256(latex_source.encode("utf-8")).hexdigest()
+
+
+def path_for(key: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, f"{key}.pdf")
+
+
+def get(key: str) -> Optional[Tuple[str, os.stat_result]]:
+    """(path, stat) of the cached PDF, or None."""
+    global hits
+    path = path_for(key)
+    try:
+        os.utime(path)
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    hits += 1
+    return path, stat
+
+
+def _adopt(key: str, tmp_path: str) -> Tuple[str, os.stat_result]:
+    """Moves a freshly compiled PDF into place and evicts if the cache is over budget."""
+    global _total_bytes
+    path = path_for(key)
+    with _lock:
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        _total_bytes += stat.st_size - old_size
+        if _total_bytes > PDF_CACHE_MAX_BYTES:
+            _evict()
+    return path, stat
+
+
+def _evict() -> None:
+    global _total_bytes
+    entries = sorted(
+        (e for e in os.scandir(PDF_CACHE_DIR) if e.name.endswith(".pdf")),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for e in entries:
+        if _total_bytes <= PDF_CACHE_MAX_BYTES * 0.9:  # leave some headroom
+            break
+        try:
+            size = e.stat().st_size
+            os.remove(e.path)
+            _total_bytes -= size
+        except FileNotFoundError:
+            pass
+
+
+async def _compile_and_store(key: str, latex_source: str) -> Tuple[str, os.stat_result]:
+    global misses
+    misses += 1
+    tmp = f"{path_for(key)}.{uuid.uuid4().hex}.tmp"
+    try:
+        await latex_compile.compile_latex(latex_source, output_path=tmp)
+        return await asyncio.to_thread(_adopt, key, tmp)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+async def get_or_compile(key: str, latex_source: str) -> Tuple[str, os.stat_result]:
+    """
+    Returns (path, stat) of the cached PDF for this LaTeX, compiling it on a
+    miss. Concurrent requests for the same source share a single tectonic run.
+    """
+    cached = await asyncio.to_thread(get, key)
+    if cached is not None:
+        return cached
+    return await _flight.do(key, lambda: _compile_and_store(key, latex_source))
+
+
+def stats() -> dict:
+    return {
+        "hits": hits,
+        "misses": misses,
+        "bytes": _total_bytes,
+        "max_bytes": PDF_CACHE_MAX_BYTES,
+        "in_flight": len(_flight),
+    }
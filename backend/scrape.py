@@ -0,0 +1,252 @@
+import asyncio, os, re, time
+from typing import Any, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+import metrics
+from cache import CACHE_DIR, DiskCache, LRUCache, TieredCache
+
+# BrightData snapshot polling (trigger once, then poll the snapshot on the event loop)
+SCRAPE_MAX_WAIT = float(os.getenv("SCRAPE_MAX_WAIT", "600"))  # give up on a snapshot after this long
+SCRAPE_POLL_INITIAL = float(os.getenv("SCRAPE_POLL_INITIAL", "2"))
+SCRAPE_POLL_MAX = float(os.getenv("SCRAPE_POLL_MAX", "20"))
+SCRAPE_POLL_FACTOR = 1.5
+# BrightData API calls in flight at once (they share the "brightdata" connection pool, see clients).
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "8"))
+BRIGHTDATA_BASE_URL = os.getenv("BRIGHTDATA_BASE_URL", "https://api.brightdata.com")
+DATASET_IDS = {"profiles": "gd_l1viktl72bvl7bjuj0", "jobs": "gd_lpfll7v5hcqtkxl6l"}
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", str(12 * 3600)))  # 0 disables the cache
+
+_PENDING_STATES = {"running", "building", "starting", "not_ready", "collecting", "digesting"}
+
+_scrape_slots = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+
+
+# Raw BrightData records keyed by "<kind>:<normalized url>"
+scrape_cache = TieredCache(
+    LRUCache(maxsize=1024, ttl=SCRAPE_CACHE_TTL),
+    DiskCache(os.path.join(CACHE_DIR, "scrape.sqlite3"), ttl=SCRAPE_CACHE_TTL, max_entries=50_000),
+)
+
+class BrightData:
+    """
+    The two datasets API calls we need (trigger a scrape, download a
+    snapshot) on a pooled httpx client, instead of the SDK's blocking
+    requests session.
+    """
+
+    def __init__(self, http: httpx.AsyncClient):
+        self.http = http
+
+    async def trigger(self, kind: str, urls) -> Any:
+        urls = [urls] if isinstance(urls, str) else urls
+        resp = await self.http.post(
+            "/datasets/v3/trigger",
+            params={"dataset_id": DATASET_IDS[kind], "include_errors": "true"},
+            json=[{"url": u} for u in urls],
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    async def download(self, snapshot_id: str) -> Any:
+        resp = await self.http.get(f"/datasets/v3/snapshot/{snapshot_id}", params={"format": "json"})
+        if resp.status_code == 202:
+            return {"status": "not_ready", "snapshot_id": snapshot_id}
+        resp.raise_for_status()
+        return resp.json()
+
+
+_JOB_ID = re.compile(r"(\d{6,})/?$")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a LinkedIn URL so equivalent links share cache entries:
+    https, www.linkedin.com (no locale subdomain), no query/fragment, no
+    trailing slash, lower-cased /in/ slugs, and /jobs/view/<id> for job links.
+    """
+    url = (url or "").strip()
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = (parts.hostname or "").lower()
+    if host != "linkedin.com" and not host.endswith(".linkedin.com"):
+        return url
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/")
+    if path.lower().startswith("/in/"):
+        path = path.lower()
+    elif path.startswith("/jobs/"):
+        job_id = parse_qs(parts.query).get("currentJobId", [None])[0]
+        if not job_id and (m := _JOB_ID.search(path)):
+            job_id = m.group(1)
+        if job_id:
+            path = f"/jobs/view/{job_id}"
+    return f"https://www.linkedin.com{path}"
+
+
+async def cached_record(kind: str, url: str) -> Optional[dict]:
+    return await scrape_cache.aget(f"{kind}:{normalize_url(url)}") if SCRAPE_CACHE_TTL else None
+
+
+async def cache_record(kind: str, url: str, record: dict) -> None:
+    if SCRAPE_CACHE_TTL:
+        await scrape_cache.aset(f"{kind}:{normalize_url(url)}", record)
+
+
+async def _call(stage: str, fn, *args):
+    async with _scrape_slots:
+        with metrics.stage(stage):
+            return await fn(*args)
+
+
+def _is_error(record: dict) -> bool:
+    """include_errors=true puts records like {"error": ..., "error_code": ...} next to the real ones."""
+    return "error" in record or "error_code" in record
+
+
+def _records(data: Any) -> List[dict]:
+    if isinstance(data, dict):
+        data = [data]
+    return [r for r in data or [] if isinstance(r, dict) and r and not _is_error(r)]
+
+
+def _error_records(data: Any) -> List[dict]:
+    return [r for r in ([data] if isinstance(data, dict) else data or []) if isinstance(r, dict) and _is_error(r)]
+
+
+def _no_records(data: Any) -> HTTPException:
+    """The scrape failure for a response without usable records, with BrightData's own error if it sent one."""
+    errors = _error_records(data)
+    if errors:
+        e = errors[0]
+        return HTTPException(status_code=502, detail=f"BrightData could not scrape: {e.get('error_code')} {e.get('error')}".strip())
+    return HTTPException(status_code=502, detail="Empty response from BrightData scraper")
+
+
+def _first_record(data: Any) -> Optional[dict]:
+    """BrightData returns a list of records; single-URL scrapes only need the first."""
+    return next(iter(_records(data)), None)
+
+
+def record_url(record: dict) -> Optional[str]:
+    """The input URL a BrightData record was scraped for."""
+    return record.get("input_url") or (record.get("input") or {}).get("url") or record.get("url")
+
+
+def _is_pending(data: Any) -> bool:
+    if not isinstance(data, dict):
+        return False
+    status = str(data.get("status", "")).lower()
+    return status in _PENDING_STATES or ("snapshot_id" in data and len(data) <= 3)
+
+
+def _trigger_failed(e: Exception) -> HTTPException:
+    """
+    A failed trigger call as an HTTPException. BrightData refusing the request
+    itself (bad URL, auth, quota) is a 4xx that no retry will fix, so it stays
+    a 4xx (the queue workers don't retry those); the rest is a retryable 502.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        code = e.response.status_code
+        if 400 <= code < 500 and code not in (408, 429):
+            status = 422 if code in (400, 404, 422) else 424
+            return HTTPException(status_code=status, detail=f"BrightData rejected the request ({code}): {e.response.text[:200]}")
+    return HTTPException(status_code=502, detail=f"BrightData trigger failed: {e}")
+
+
+async def _trigger_raw(client: BrightData, kind: str, urls) -> Tuple[Optional[str], Any]:
+    """Asks BrightData once for one URL or a list of them."""
+    data = await client.trigger(kind, urls)
+    if isinstance(data, str):
+        return data, None
+    if isinstance(data, dict) and data.get("snapshot_id"):
+        return data["snapshot_id"], None
+    return None, data
+
+
+async def _trigger(client: BrightData, kind: str, url: str) -> Tuple[Optional[str], Optional[dict]]:
+    """Returns (snapshot_id, None) or (None, record)."""
+    snapshot_id, data = await _trigger_raw(client, kind, url)
+    if snapshot_id:
+        return snapshot_id, None
+    record = _first_record(data)
+    if record is None:
+        raise _no_records(data)
+    return None, record
+
+
+async def _download(client: BrightData, snapshot_id: str) -> Any:
+    return await client.download(snapshot_id)
+
+
+async def poll_snapshot_records(client, snapshot_id: str) -> List[dict]:
+    """
+    Polls a snapshot with exponential backoff. A poll only holds a scrape
+    slot for the length of one HTTP call; the waiting happens on the event loop.
+    """
+    delay = SCRAPE_POLL_INITIAL
+    deadline = time.monotonic() + SCRAPE_MAX_WAIT
+    attempt = 0
+    while True:
+        attempt += 1
+        data = None
+        try:
+            data = await _call("brightdata_download", _download, client, snapshot_id)
+        except Exception as e:
+            print(f"❌ Snapshot {snapshot_id} poll {attempt} failed: {e}")
+        if data is not None and not _is_pending(data):
+            records = _records(data)
+            if records:
+                print(f"✅ Snapshot {snapshot_id} ready after {attempt} polls")
+                return records
+            if _error_records(data):  # polling again won't change that
+                raise _no_records(data)
+            print(f"⚠️ Snapshot {snapshot_id} returned no records on poll {attempt}")
+
+        if time.monotonic() + delay > deadline:
+            raise HTTPException(status_code=504, detail=f"BrightData snapshot {snapshot_id} not ready in time.")
+        await asyncio.sleep(delay)
+        delay = min(delay * SCRAPE_POLL_FACTOR, SCRAPE_POLL_MAX)
+
+
+async def poll_snapshot(client, snapshot_id: str) -> dict:
+    return (await poll_snapshot_records(client, snapshot_id))[0]
+
+
+async def trigger_many(client, kind: str, urls: List[str]) -> Tuple[Optional[str], List[dict]]:
+    """
+    Triggers one BrightData scrape for all `urls`.
+    Returns (snapshot_id, []) to poll, or (None, records) if answered inline.
+    """
+    try:
+        snapshot_id, data = await _call("brightdata_trigger", _trigger_raw, client, kind, urls)
+    except Exception as e:
+        raise _trigger_failed(e)
+    if snapshot_id:
+        return snapshot_id, []
+    records = _records(data)
+    if not records:
+        raise _no_records(data)
+    return None, records
+
+
+async def fetch_record(client, kind: str, url: str) -> dict:
+    """
+    The scraped record for `url`: from the scrape cache, or triggered and
+    polled to completion. Used by the queue workers; concurrent requests for
+    one normalized URL already share a single task (see api._enqueue_scrape).
+    """
+    url = normalize_url(url)
+    cached = await cached_record(kind, url)
+    if cached is not None:
+        return cached
+    try:
+        snapshot_id, data = await _call("brightdata_trigger", _trigger, client, kind, url)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _trigger_failed(e)
+    if data is None:
+        data = await poll_snapshot(client, snapshot_id)
+    await cache_record(kind, url, data)
+    return data
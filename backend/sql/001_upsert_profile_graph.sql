@@ -0,0 +1,61 @@
+-- Writes a whole scraped profile (profile row + experiences, education, skills)
+-- in one call and one transaction, and returns the row counts.
+--
+--   select upsert_profile_graph('{"linkedin_url": "...", "full_name": "...",
+--     "experiences": [...], "education": [...], "skills": [{"name": "..."}]}');
+--
+-- Apply with psql or the Supabase SQL editor. Called from api.py via supabase.rpc().
+
+create or replace function public.upsert_profile_graph(payload jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+  p profiles := jsonb_populate_record(null::profiles, payload);
+  v_profile_id profiles.id%type;
+  v_exp int;
+  v_edu int;
+  v_skills int;
+begin
+  if p.linkedin_url is not null then
+    -- serialise concurrent saves of the same profile (linkedin_url may not be unique-indexed)
+    perform pg_advisory_xact_lock(hashtext(p.linkedin_url));
+    select id into v_profile_id from profiles where linkedin_url = p.linkedin_url limit 1;
+  end if;
+
+  if v_profile_id is null then
+    insert into profiles (linkedin_url, full_name, headline, location)
+    values (p.linkedin_url, p.full_name, p.headline, p.location)
+    returning id into v_profile_id;
+  else
+    update profiles
+       set full_name = p.full_name, headline = p.headline, location = p.location
+     where id = v_profile_id;
+  end if;
+
+  delete from experiences where profile_id = v_profile_id;
+  insert into experiences (profile_id, title, company, location, description, start_date, end_date)
+  select v_profile_id, r.title, r.company, r.location, r.description, r.start_date, r.end_date
+    from jsonb_populate_recordset(null::experiences, coalesce(payload->'experiences', '[]'::jsonb)) r;
+  get diagnostics v_exp = row_count;
+
+  delete from education where profile_id = v_profile_id;
+  insert into education (profile_id, school, degree, field, start_year, end_year)
+  select v_profile_id, r.school, r.degree, r.field, r.start_year, r.end_year
+    from jsonb_populate_recordset(null::education, coalesce(payload->'education', '[]'::jsonb)) r;
+  get diagnostics v_edu = row_count;
+
+  delete from skills where profile_id = v_profile_id;
+  insert into skills (profile_id, name)
+  select v_profile_id, r.name
+    from jsonb_populate_recordset(null::skills, coalesce(payload->'skills', '[]'::jsonb)) r;
+  get diagnostics v_skills = row_count;
+
+  return jsonb_build_object(
+    'profile_id', v_profile_id,
+    'experiences', v_exp,
+    'education', v_edu,
+    'skills', v_skills
+  );
+end;
+$$;
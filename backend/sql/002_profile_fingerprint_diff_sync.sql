@@ -0,0 +1,128 @@
+-- Content fingerprints for profiles and row-level diff sync of child rows.
+--
+-- api.py sends a content_hash for the whole profile plus a row_key (identity)
+-- and row_hash (content) for every experience, education and skill row.
+-- upsert_profile_graph then:
+--   * skips every child write when the stored content_hash is unchanged;
+--   * otherwise deletes rows whose row_key disappeared, inserts new keys and
+--     updates only rows whose row_hash changed.
+-- Apply after 001_upsert_profile_graph.sql.
+
+alter table profiles    add column if not exists content_hash text;
+alter table experiences add column if not exists row_key text, add column if not exists row_hash text;
+alter table education   add column if not exists row_key text, add column if not exists row_hash text;
+alter table skills      add column if not exists row_key text, add column if not exists row_hash text;
+
+create unique index if not exists experiences_profile_row_key on experiences (profile_id, row_key);
+create unique index if not exists education_profile_row_key   on education (profile_id, row_key);
+create unique index if not exists skills_profile_row_key      on skills (profile_id, row_key);
+
+create or replace function public.upsert_profile_graph(payload jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+  p profiles := jsonb_populate_record(null::profiles, payload);
+  v_profile_id profiles.id%type;
+  v_stored_hash text;
+  v_exp jsonb := coalesce(payload->'experiences', '[]'::jsonb);
+  v_edu jsonb := coalesce(payload->'education', '[]'::jsonb);
+  v_skills jsonb := coalesce(payload->'skills', '[]'::jsonb);
+  v_ins int;
+  v_upd int;
+  v_del int;
+  v_diff jsonb := '{}'::jsonb;
+begin
+  if p.linkedin_url is not null then
+    -- serialise concurrent saves of the same profile (linkedin_url may not be unique-indexed)
+    perform pg_advisory_xact_lock(hashtext(p.linkedin_url));
+    select id, content_hash into v_profile_id, v_stored_hash
+      from profiles where linkedin_url = p.linkedin_url limit 1;
+  end if;
+
+  if v_profile_id is not null and v_stored_hash is not distinct from p.content_hash then
+    return jsonb_build_object(
+      'profile_id', v_profile_id,
+      'unchanged', true,
+      'experiences', jsonb_array_length(v_exp),
+      'education', jsonb_array_length(v_edu),
+      'skills', jsonb_array_length(v_skills),
+      'diff', v_diff
+    );
+  end if;
+
+  if v_profile_id is null then
+    insert into profiles (linkedin_url, full_name, headline, location, content_hash)
+    values (p.linkedin_url, p.full_name, p.headline, p.location, p.content_hash)
+    returning id into v_profile_id;
+  else
+    update profiles
+       set full_name = p.full_name, headline = p.headline, location = p.location,
+           content_hash = p.content_hash
+     where id = v_profile_id;
+  end if;
+
+  -- experiences
+  delete from experiences
+   where profile_id = v_profile_id
+     and (row_key is null or row_key not in (select e->>'row_key' from jsonb_array_elements(v_exp) e));
+  get diagnostics v_del = row_count;
+  with up as (
+    insert into experiences (profile_id, row_key, row_hash, title, company, location, description, start_date, end_date)
+    select v_profile_id, r.row_key, r.row_hash, r.title, r.company, r.location, r.description, r.start_date, r.end_date
+      from jsonb_populate_recordset(null::experiences, v_exp) r
+    on conflict (profile_id, row_key) do update
+       set row_hash = excluded.row_hash, title = excluded.title, company = excluded.company,
+           location = excluded.location, description = excluded.description,
+           start_date = excluded.start_date, end_date = excluded.end_date
+     where experiences.row_hash is distinct from excluded.row_hash
+    returning (xmax = 0) as inserted
+  )
+  select count(*) filter (where inserted), count(*) filter (where not inserted) into v_ins, v_upd from up;
+  v_diff := v_diff || jsonb_build_object('experiences', jsonb_build_object('inserted', v_ins, 'updated', v_upd, 'deleted', v_del));
+
+  -- education
+  delete from education
+   where profile_id = v_profile_id
+     and (row_key is null or row_key not in (select e->>'row_key' from jsonb_array_elements(v_edu) e));
+  get diagnostics v_del = row_count;
+  with up as (
+    insert into education (profile_id, row_key, row_hash, school, degree, field, start_year, end_year)
+    select v_profile_id, r.row_key, r.row_hash, r.school, r.degree, r.field, r.start_year, r.end_year
+      from jsonb_populate_recordset(null::education, v_edu) r
+    on conflict (profile_id, row_key) do update
+       set row_hash = excluded.row_hash, school = excluded.school, degree = excluded.degree,
+           field = excluded.field, start_year = excluded.start_year, end_year = excluded.end_year
+     where education.row_hash is distinct from excluded.row_hash
+    returning (xmax = 0) as inserted
+  )
+  select count(*) filter (where inserted), count(*) filter (where not inserted) into v_ins, v_upd from up;
+  v_diff := v_diff || jsonb_build_object('education', jsonb_build_object('inserted', v_ins, 'updated', v_upd, 'deleted', v_del));
+
+  -- skills
+  delete from skills
+   where profile_id = v_profile_id
+     and (row_key is null or row_key not in (select e->>'row_key' from jsonb_array_elements(v_skills) e));
+  get diagnostics v_del = row_count;
+  with up as (
+    insert into skills (profile_id, row_key, row_hash, name)
+    select v_profile_id, r.row_key, r.row_hash, r.name
+      from jsonb_populate_recordset(null::skills, v_skills) r
+    on conflict (profile_id, row_key) do update
+       set row_hash = excluded.row_hash, name = excluded.name
+     where skills.row_hash is distinct from excluded.row_hash
+    returning (xmax = 0) as inserted
+  )
+  select count(*) filter (where inserted), count(*) filter (where not inserted) into v_ins, v_upd from up;
+  v_diff := v_diff || jsonb_build_object('skills', jsonb_build_object('inserted', v_ins, 'updated', v_upd, 'deleted', v_del));
+
+  return jsonb_build_object(
+    'profile_id', v_profile_id,
+    'unchanged', false,
+    'experiences', jsonb_array_length(v_exp),
+    'education', jsonb_array_length(v_edu),
+    'skills', jsonb_array_length(v_skills),
+    'diff', v_diff
+  );
+end;
+$$;
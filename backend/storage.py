@@ -0,0 +1,169 @@
+import asyncio, base64, hashlib, os
+from typing import AsyncIterator, List, Optional, Sequence
+
+import httpx
+from fastapi import HTTPException
+
+import clients
+import metrics
+from cache import SingleFlight
+
+# Generated PDFs in Supabase Storage, stored under the sha256 of their bytes so
+# identical resumes are uploaded once. Object names and public URLs are
+# derived locally; an upload is skipped when the object is already there.
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "resumes")
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_CHUNK = 256 * 1024  # bytes per read while streaming a file up
+# Files at least this large go through the resumable (TUS) endpoint in 6 MiB
+# parts, the part size Supabase expects; smaller ones are one streamed POST.
+RESUMABLE_THRESHOLD = int(os.getenv("RESUMABLE_THRESHOLD", str(6 * 1024 * 1024)))
+RESUMABLE_PART = 6 * 1024 * 1024
+
+_upload_slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+_flight = SingleFlight()
+_stored: set = set()  # object names known to exist, so repeats skip the HEAD request
+uploads = 0
+skipped = 0
+bytes_uploaded = 0
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def object_name(digest: str) -> str:
+    return f"{digest[:2]}/{digest}.pdf"
+
+
+def public_url(name: str) -> str:
+    return f"{clients.SUPABASE_URL.rstrip('/')}/storage/v1/object/public/{STORAGE_BUCKET}/{name}"
+
+
+async def _session() -> httpx.AsyncClient:
+    """The Supabase Storage client on the shared "supabase" pool (base URL .../storage/v1/, auth headers set)."""
+    return (await clients.supabase()).storage.session
+
+
+async def _read_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, UPLOAD_CHUNK):
+            yield chunk
+
+
+async def _exists(http: httpx.AsyncClient, name: str) -> bool:
+    with metrics.stage("storage_exists"):
+        resp = await http.head(f"object/{STORAGE_BUCKET}/{name}")
+    return resp.status_code == 200
+
+
+def _raise_for_upload(resp: httpx.Response) -> None:
+    if resp.status_code >= 400:
+        raise HTTPException(status_code=502, detail=f"Upload failed ({resp.status_code}): {resp.text[:200]}")
+
+
+def _duplicate(resp: httpx.Response) -> bool:
+    # Storage answers 409 (or 400 with a "Duplicate" body) when the object exists
+    return resp.status_code == 409 or (resp.status_code == 400 and "Duplicate" in resp.text)
+
+
+async def _upload_streamed(http: httpx.AsyncClient, path: str, name: str, size: int) -> None:
+    resp = await http.post(
+        f"object/{STORAGE_BUCKET}/{name}",
+        content=_read_chunks(path),
+        headers={"Content-Type": "application/pdf", "Content-Length": str(size), "x-upsert": "false"},
+    )
+    if not _duplicate(resp):
+        _raise_for_upload(resp)
+
+
+def _tus_metadata(**fields: str) -> str:
+    return ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in fields.items())
+
+
+async def _upload_resumable(http: httpx.AsyncClient, path: str, name: str, size: int) -> None:
+    """TUS upload: create the upload, then PATCH it part by part, resuming from the server's offset on errors."""
+    tus = {"Tus-Resumable": "1.0.0"}
+    resp = await http.post("upload/resumable", headers={
+        **tus,
+        "Upload-Length": str(size),
+        "Upload-Metadata": _tus_metadata(bucketName=STORAGE_BUCKET, objectName=name, contentType="application/pdf"),
+        "x-upsert": "false",
+    })
+    if _duplicate(resp):
+        return
+    _raise_for_upload(resp)
+    location = resp.headers["Location"]
+    offset, retries = 0, 0
+    with open(path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            part = await asyncio.to_thread(f.read, RESUMABLE_PART)
+            try:
+                resp = await http.patch(location, content=part, headers={
+                    **tus, "Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream",
+                })
+                _raise_for_upload(resp)
+                offset = int(resp.headers["Upload-Offset"])
+                retries = 0
+            except (httpx.TransportError, HTTPException):
+                retries += 1
+                if retries > 3:
+                    raise
+                await asyncio.sleep(retries)
+                head = await http.head(location, headers=tus)
+                _raise_for_upload(head)
+                offset = int(head.headers["Upload-Offset"])
+
+
+async def _store(path: str, name: str) -> None:
+    global uploads, skipped, bytes_uploaded
+    http = await _session()
+    async with _upload_slots:
+        if await _exists(http, name):
+            skipped += 1
+        else:
+            size = os.path.getsize(path)
+            with metrics.stage("storage_upload"):
+                if size >= RESUMABLE_THRESHOLD:
+                    await _upload_resumable(http, path, name, size)
+                else:
+                    await _upload_streamed(http, path, name, size)
+            uploads += 1
+            bytes_uploaded += size
+    _stored.add(name)
+
+
+async def upload_pdf(path: str, digest: Optional[str] = None) -> str:
+    """
+    Uploads the PDF at `path` under its content hash (pass `digest` if it is
+    already known) and returns its public URL. Already stored content is not
+    sent again; concurrent uploads of the same content share one request.
+    """
+    global skipped
+    digest = digest or await asyncio.to_thread(file_hash, path)
+    name = object_name(digest)
+    if name in _stored:
+        skipped += 1
+    else:
+        await _flight.do(name, lambda: _store(path, name))
+    return public_url(name)
+
+
+async def upload_many(paths: Sequence[str]) -> List[str]:
+    """Public URLs for many PDFs, uploaded concurrently (at most UPLOAD_CONCURRENCY at a time)."""
+    return list(await asyncio.gather(*(upload_pdf(p) for p in paths)))
+
+
+def stats() -> dict:
+    return {
+        "bucket": STORAGE_BUCKET,
+        "uploads": uploads,
+        "skipped": skipped,
+        "bytes_uploaded": bytes_uploaded,
+        "known_objects": len(_stored),
+        "in_flight": len(_flight),
+    }
@@ -0,0 +1,219 @@
+import json, os, random, sqlite3, threading, time, uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cache import CACHE_DIR
+
+# Durable task queue shared by the API (enqueue, status) and the worker
+# processes (claim, complete, fail), in one SQLite file. A claimed task holds a
+# lease that its worker keeps extending; if the worker dies the lease runs out
+# and another worker picks the task up again. Failed attempts are retried with
+# exponential backoff until TASK_MAX_ATTEMPTS.
+QUEUE_PATH = os.getenv("QUEUE_PATH", os.path.join(CACHE_DIR, "queue.sqlite3"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "5"))
+TASK_LEASE = float(os.getenv("TASK_LEASE", "60"))  # seconds; workers heartbeat at a third of this
+TASK_BACKOFF = float(os.getenv("TASK_BACKOFF", "5"))  # first retry delay, doubled per attempt
+TASK_BACKOFF_MAX = float(os.getenv("TASK_BACKOFF_MAX", "600"))
+TASK_RESULT_TTL = float(os.getenv("TASK_RESULT_TTL", str(12 * 3600)))  # done tasks answer repeats this long
+TASK_RETENTION = float(os.getenv("TASK_RETENTION", str(7 * 24 * 3600)))  # then prune() deletes them
+
+_lock = threading.Lock()
+os.makedirs(os.path.dirname(QUEUE_PATH), exist_ok=True)
+_db = sqlite3.connect(QUEUE_PATH, check_same_thread=False, isolation_level=None, timeout=30)
+_db.row_factory = sqlite3.Row
+_db.execute("PRAGMA journal_mode=WAL")
+_db.execute(
+    "CREATE TABLE IF NOT EXISTS tasks ("
+    " id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, idempotency_key TEXT UNIQUE,"
+    " status TEXT NOT NULL, stage TEXT, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+    " run_at REAL NOT NULL, lease_until REAL, worker TEXT, result TEXT, error TEXT,"
+    " created REAL NOT NULL, updated REAL NOT NULL)"
+)
+_db.execute("CREATE INDEX IF NOT EXISTS tasks_ready ON tasks(status, run_at)")
+_db.execute("CREATE TABLE IF NOT EXISTS task_aliases (alias TEXT PRIMARY KEY, task_id TEXT NOT NULL)")
+# Keys of per-process caches whose value changed, e.g. "profile:<id>" after a
+# worker rewrote that profile; readers drop their copy when a key's seq moves.
+_db.execute("CREATE TABLE IF NOT EXISTS invalidations (key TEXT PRIMARY KEY, seq INTEGER NOT NULL)")
+_db.execute("CREATE INDEX IF NOT EXISTS invalidations_seq ON invalidations(seq)")
+
+# status values
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def _task(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    task = dict(row)
+    task["payload"] = json.loads(task["payload"])
+    task["result"] = json.loads(task["result"]) if task["result"] is not None else None
+    return task
+
+
+def _live(row: Optional[sqlite3.Row], now: float) -> bool:
+    """Whether a task still answers repeats of its key: queued, running or recently done."""
+    return row is not None and (
+        row["status"] in (QUEUED, RUNNING) or (row["status"] == DONE and row["updated"] > now - TASK_RESULT_TTL)
+    )
+
+
+def enqueue(
+    kind: str, payload: dict, idempotency_key: Optional[str] = None, alias: Optional[str] = None
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Adds a task and returns (task, created). With an idempotency key, a queued,
+    running or recently finished task under the same key is returned instead
+    (created=False); failed and expired ones are replaced by a new task.
+    `alias` is a second key looked up first (e.g. a client's Idempotency-Key)
+    and pointed at the task that is returned.
+    """
+    now = time.time()
+    with _lock:
+        _db.execute("BEGIN IMMEDIATE")
+        try:
+            row = None
+            if alias is not None:
+                row = _db.execute(
+                    "SELECT tasks.* FROM task_aliases JOIN tasks ON tasks.id = task_aliases.task_id"
+                    " WHERE task_aliases.alias = ?",
+                    (alias,),
+                ).fetchone()
+                row = row if _live(row, now) else None
+            if row is None and idempotency_key is not None:
+                row = _db.execute("SELECT * FROM tasks WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+                if row is not None and not _live(row, now):
+                    _db.execute("UPDATE tasks SET idempotency_key = NULL WHERE id = ?", (row["id"],))
+                    row = None
+            created = row is None
+            if created:
+                task_id = uuid.uuid4().hex
+                _db.execute(
+                    "INSERT INTO tasks (id, kind, payload, idempotency_key, status, max_attempts, run_at, created, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (task_id, kind, json.dumps(payload), idempotency_key, QUEUED, TASK_MAX_ATTEMPTS, now, now, now),
+                )
+                row = _db.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if alias is not None:
+                _db.execute("INSERT OR REPLACE INTO task_aliases (alias, task_id) VALUES (?, ?)", (alias, row["id"]))
+            _db.execute("COMMIT")
+        except BaseException:
+            _db.execute("ROLLBACK")
+            raise
+    return _task(row), created
+
+
+def get(task_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        return _task(_db.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone())
+
+
+def claim(worker: str, kinds: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """Leases the next due task of one of `kinds` to `worker` (counting the attempt), or returns None."""
+    now = time.time()
+    marks = ",".join("?" * len(kinds))
+    with _lock:
+        # tasks whose worker died on their last attempt
+        _db.execute(
+            "UPDATE tasks SET status = ?, error = 'worker lost (lease expired)', updated = ?"
+            " WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+            (FAILED, now, RUNNING, now),
+        )
+        row = _db.execute(
+            "UPDATE tasks SET status = ?, attempts = attempts + 1, lease_until = ?, worker = ?, updated = ?"
+            " WHERE id = (SELECT id FROM tasks WHERE kind IN (" + marks + ") AND"
+            " ((status = ? AND run_at <= ?) OR (status = ? AND lease_until < ?)) ORDER BY run_at LIMIT 1)"
+            " RETURNING *",
+            (RUNNING, now + TASK_LEASE, worker, now, *kinds, QUEUED, now, RUNNING, now),
+        ).fetchone()
+    return _task(row)
+
+
+def heartbeat(task_id: str, worker: str, stage: Optional[str] = None) -> bool:
+    """Extends the lease (and records the current stage); False if the task is no longer ours."""
+    now = time.time()
+    with _lock:
+        cur = _db.execute(
+            "UPDATE tasks SET lease_until = ?, stage = COALESCE(?, stage), updated = ?"
+            " WHERE id = ? AND worker = ? AND status = ?",
+            (now + TASK_LEASE, stage, now, task_id, worker, RUNNING),
+        )
+    return cur.rowcount == 1
+
+
+def complete(task_id: str, worker: str, result: Any) -> None:
+    with _lock:
+        _db.execute(
+            "UPDATE tasks SET status = ?, result = ?, error = NULL, lease_until = NULL, updated = ?"
+            " WHERE id = ? AND worker = ? AND status = ?",
+            (DONE, json.dumps(result, default=str), time.time(), task_id, worker, RUNNING),
+        )
+
+
+def fail(task_id: str, worker: str, error: str, retry: bool = True) -> Optional[float]:
+    """Records a failed attempt; requeues it with backoff unless out of attempts. Returns the retry delay."""
+    now = time.time()
+    with _lock:
+        row = _db.execute(
+            "SELECT attempts, max_attempts FROM tasks WHERE id = ? AND worker = ? AND status = ?",
+            (task_id, worker, RUNNING),
+        ).fetchone()
+        if row is None:
+            return None
+        if retry and row["attempts"] < row["max_attempts"]:
+            delay = min(TASK_BACKOFF * 2 ** (row["attempts"] - 1), TASK_BACKOFF_MAX) * random.uniform(0.8, 1.2)
+            _db.execute(
+                "UPDATE tasks SET status = ?, run_at = ?, error = ?, lease_until = NULL, updated = ? WHERE id = ?",
+                (QUEUED, now + delay, error, now, task_id),
+            )
+            return delay
+        _db.execute(
+            "UPDATE tasks SET status = ?, error = ?, lease_until = NULL, updated = ? WHERE id = ?",
+            (FAILED, error, now, task_id),
+        )
+    return None
+
+
+def prune() -> int:
+    """Deletes finished tasks older than TASK_RETENTION (and their aliases)."""
+    with _lock:
+        cur = _db.execute(
+            "DELETE FROM tasks WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, time.time() - TASK_RETENTION)
+        )
+        _db.execute("DELETE FROM task_aliases WHERE task_id NOT IN (SELECT id FROM tasks)")
+    return cur.rowcount
+
+
+def invalidate(key: str) -> None:
+    """Marks `key` stale in every process that caches it (see invalidated_since)."""
+    with _lock:
+        _db.execute(
+            "INSERT INTO invalidations (key, seq) VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM invalidations))"
+            " ON CONFLICT(key) DO UPDATE SET seq = excluded.seq",
+            (key,),
+        )
+
+
+def invalidated_since(prefix: str, seq: Optional[int]) -> Tuple[int, List[str]]:
+    """
+    Returns (newest seq, keys under `prefix` invalidated after `seq`). With
+    seq=None only the newest seq is returned, for a reader starting out empty.
+    """
+    with _lock:
+        newest = _db.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+        if seq is None or newest <= seq:
+            return newest, []
+        rows = _db.execute(
+            "SELECT key FROM invalidations WHERE seq > ? AND seq <= ? AND substr(key, 1, ?) = ?",
+            (seq, newest, len(prefix), prefix),
+        ).fetchall()
+    return newest, [r["key"][len(prefix):] for r in rows]
+
+
+def stats() -> dict:
+    with _lock:
+        counts = dict(_db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        now = time.time()
+        oldest = _db.execute("SELECT MIN(run_at) FROM tasks WHERE status = ? AND run_at <= ?", (QUEUED, now)).fetchone()[0]
+    return {
+        **{s: counts.get(s, 0) for s in (QUEUED, RUNNING, DONE, FAILED)},
+        "oldest_due_s": round(now - oldest, 1) if oldest else None,
+        "path": QUEUE_PATH,
+    }
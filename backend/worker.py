@@ -0,0 +1,153 @@
+"""
+Runs queued profile/job tasks (work_queue): scrape through BrightData, extract
+keywords, write to Supabase. Started by the API (WORKER_PROCESSES) or on its own:
+
+    python worker.py --processes 4
+
+Each process runs up to WORKER_CONCURRENCY tasks at once on its event loop, so
+the CPU-side work spreads over the processes and the waiting overlaps within one.
+"""
+import argparse, asyncio, multiprocessing, os, signal, socket, time, traceback
+
+from fastapi import HTTPException
+
+import metrics
+import work_queue
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_POLL = float(os.getenv("WORKER_POLL", "0.2"))  # seconds between queue checks when idle
+PRUNE_EVERY = 3600
+
+KINDS = {"profile": "profiles", "job": "jobs"}  # task kind -> scrape kind
+
+
+def _retryable(e: BaseException) -> bool:
+    # bad input (4xx) fails for good; timeouts, upstream and transport errors are retried
+    return not (isinstance(e, HTTPException) and e.status_code < 500)
+
+
+async def _run_task(api, task: dict, worker_id: str) -> None:
+    task_id = task["id"]
+    this = asyncio.current_task()
+    lost = False
+
+    async def still_ours(stage=None) -> bool:
+        """Heartbeats the lease; False once another worker may have re-claimed the task."""
+        nonlocal lost
+        lost = lost or not await asyncio.to_thread(work_queue.heartbeat, task_id, worker_id, stage)
+        return not lost
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(work_queue.TASK_LEASE / 3)
+            if not await still_ours():
+                this.cancel()  # don't scrape and write a second time next to the new owner
+                return
+
+    if not await still_ours("scrape"):
+        print(f"⚠️ Task {task_id} ({task['kind']}) lost its lease before starting")
+        return
+    beat = asyncio.create_task(heartbeat())
+    try:
+        client = await api.brightdata_client()
+        data = await api.scrape.fetch_record(client, KINDS[task["kind"]], task["payload"]["url"])
+        if not await still_ours("process"):
+            print(f"⚠️ Task {task_id} ({task['kind']}) lost its lease after scraping, stopped attempt {task['attempts']}")
+            return
+        process = api._process_profile if task["kind"] == "profile" else api._process_job
+        result = await process(data)
+    except asyncio.CancelledError:
+        if not lost:
+            raise  # shutting down
+        print(f"⚠️ Task {task_id} ({task['kind']}) lost its lease, stopped attempt {task['attempts']}")
+        return
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else repr(e)
+        delay = await asyncio.to_thread(work_queue.fail, task_id, worker_id, str(detail), _retryable(e))
+        if delay is None:
+            print(f"❌ Task {task_id} ({task['kind']}) failed after {task['attempts']} attempts: {detail}")
+            if not isinstance(e, HTTPException):
+                traceback.print_exc()
+        else:
+            print(f"⚠️ Task {task_id} ({task['kind']}) attempt {task['attempts']} failed, retrying in {delay:.0f}s: {detail}")
+        return
+    finally:
+        beat.cancel()
+    await asyncio.to_thread(work_queue.complete, task_id, worker_id, result)
+
+
+async def run(worker_id: str) -> None:
+    import api  # the pipeline code (and its clients) the API itself uses
+
+    # stage histograms land in metrics.MULTIPROC_DIR, which the API's /metrics aggregates
+    metrics.prune_dead()
+    api.supabase = await api.clients.supabase()
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    running = set()
+    last_prune = 0.0
+    print(f"✅ Worker {worker_id} ready")
+    try:
+        while True:
+            await slots.acquire()
+            task = await asyncio.to_thread(work_queue.claim, worker_id, list(KINDS))
+            if task is None:
+                slots.release()
+                if time.monotonic() - last_prune > PRUNE_EVERY:
+                    last_prune = time.monotonic()
+                    await asyncio.to_thread(work_queue.prune)
+                await asyncio.sleep(WORKER_POLL)
+                continue
+            job = asyncio.create_task(_run_task(api, task, worker_id))
+            running.add(job)
+            job.add_done_callback(lambda t: (running.discard(t), slots.release()))
+    finally:
+        for job in running:
+            job.cancel()  # the leases run out and other workers take these over
+        await api.clients.aclose()
+
+
+def _process_main(index: int) -> None:
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(run(f"{socket.gethostname()}:{os.getpid()}:{index}"))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", "-p", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--parent", type=int, help="stop when this process (the API that started us) is gone")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = {}
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    # keep N processes alive; a crashed one is replaced and its tasks are re-leased
+    while not stopping:
+        if args.parent and os.getppid() != args.parent:
+            print("⚠️ API process is gone, stopping workers")
+            break
+        for i in range(args.processes):
+            p = procs.get(i)
+            if p is None or not p.is_alive():
+                if p is not None:
+                    print(f"⚠️ Worker process {i} exited with {p.exitcode}, restarting")
+                procs[i] = ctx.Process(target=_process_main, args=(i,), daemon=True)
+                procs[i].start()
+        time.sleep(1)
+    for p in procs.values():
+        p.terminate()
+    for p in procs.values():
+        p.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,8 @@ const diffLeft = document.getElementById("diffLeft");
 const diffRight = document.getElementById("diffRight");
 const regenBullet = document.getElementById("regenBullet");
 const acceptBullet = document.getElementById("acceptBullet");
+const tailorStatus = document.getElementById("tailorStatus");
+const tailorKeywords = document.getElementById("tailorKeywords");
 
 const composeResume = document.getElementById("composeResume");
 const composeStatus = document.getElementById("composeStatus");
@@ -89,6 +91,20 @@ async function send(tabId, message) {
   });
 }
 
+/* Poll a pending BrightData snapshot (202 from /api/profile or /api/job) until it finishes */
+async function waitForScrape(statusUrl, { interval = 3000, maxWaitMs = 10 * 60 * 1000 } = {}) {
+  const base = BACKEND_URL.replace(/\/$/, "");
+  const deadline = Date.now() + maxWaitMs;
+  while (Date.now() < deadline) {
+    await new Promise(r => setTimeout(r, interval));
+    const resp = await fetch(`${base}${statusUrl}`);
+    const status = await resp.json();
+    if (status.status === "done") return status.result;
+    if (status.status !== "pending") throw new Error(status.error || "Scrape failed");
+  }
+  throw new Error("Scrape timed out");
+}
+
 /* 1) Scrape and send LinkedIn profile */
 scrapeProfileBtn.addEventListener("click", async () => {
   profileStatus.textContent = "Checking page...";
@@ -122,14 +138,19 @@ scrapeProfileBtn.addEventListener("click", async () => {
 
     if (!resp.ok) throw new Error("Server returned " + resp.status);
 
-    const data = await resp.json();
+    let data = await resp.json();
+    if (resp.status === 202) {
+      profileStatus.textContent = "Scrape queued, waiting for BrightData...";
+      data = await waitForScrape(data.status_url);
+    }
 
     if (data.success) {
       profileStatus.textContent = "Profile saved successfully.";
       profileSaved.textContent = "Yes";
       profileExpCount.textContent = data.experienceCount ?? 0;
       toast("✅ Profile saved!");
-      chrome.storage.local.set({ profileData: data });
+      await chrome.storage.local.set({ profileData: data });
+      updateMatch();
     } else {
       profileStatus.textContent = "Server error.";
       toast("⚠️ Could not save profile. Try again.");
@@ -163,11 +184,16 @@ scrapeJobBtn.addEventListener("click", async () => {
       body: JSON.stringify(result.result)
     });
 
-    const data = await resp.json();
+    let data = await resp.json();
+    if (resp.status === 202) {
+      jobStatus.textContent = "Scrape queued, waiting for BrightData...";
+      data = await waitForScrape(data.status_url);
+    }
     if (data.success) {
       jobStatus.textContent = `✅ Job saved: ${result.result.title}`;
-      chrome.storage.local.set({ jobData: result.result });
+      await chrome.storage.local.set({ jobData: result.result });
       toast("Job captured");
+      updateMatch();
     }
   } catch (err) {
     console.error(err);
@@ -175,12 +201,80 @@ scrapeJobBtn.addEventListener("click", async () => {
   }
 });
 
-/* Simulated score for wow factor */
-function simulateScore(job) {
-  const base = 52 + Math.min(30, (job.title || "").length % 30);
-  return Math.min(98, Math.max(24, base));
+/* Match score from the backend (/api/match): gauge + missing skills */
+async function updateMatch() {
+  const { profileData, jobData } = await chrome.storage.local.get(["profileData", "jobData"]);
+  if (!profileData?.profile_id || !jobData) return;
+  try {
+    const resp = await fetch(`${BACKEND_URL.replace(/\/$/, "")}/api/match`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ profile_id: profileData.profile_id, jobs: [jobData] }),
+    });
+    if (!resp.ok) throw new Error("Server returned " + resp.status);
+    const { results: [match] } = await resp.json();
+    animateGauge(match.score);
+    renderChips(match.missing);
+  } catch (err) {
+    console.error(err);
+  }
 }
 
+/* Tailored bullets, streamed over SSE from /api/tailor/stream as the model writes them */
+async function streamTailor() {
+  const { profileData, jobData } = await chrome.storage.local.get(["profileData", "jobData"]);
+  if (!profileData?.profile_id || !jobData) { toast("Capture profile and job first"); return; }
+  tailorStatus.textContent = "Rewriting...";
+  tailorKeywords.innerHTML = "";
+  diffLeft.textContent = "";
+  diffRight.textContent = "";
+  const originals = {};
+  const bullets = {};
+  const onEvent = (event, data) => {
+    if (event === "experience") {
+      // the stored experiences, in the order the "bullet" events refer to
+      originals[data.experience] = data.description || "";
+      diffLeft.textContent = Object.keys(originals).sort((a, b) => a - b).map(i => originals[i]).join("\n\n");
+    } else if (event === "keyword") {
+      const el = document.createElement("div");
+      el.className = "chip";
+      el.textContent = data.keyword;
+      tailorKeywords.appendChild(el);
+    } else if (event === "bullet") {
+      (bullets[data.experience] ||= []).push(`• ${data.bullet}`);
+      diffRight.textContent = Object.keys(bullets).sort((a, b) => a - b).map(i => bullets[i].join("\n")).join("\n\n");
+    } else if (event === "done") {
+      tailorStatus.textContent = "Done";
+    }
+  };
+  try {
+    const resp = await fetch(`${BACKEND_URL.replace(/\/$/, "")}/api/tailor/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+      body: JSON.stringify({ profile_id: profileData.profile_id, job: jobData }),
+    });
+    if (!resp.ok) throw new Error("Server returned " + resp.status);
+    const reader = resp.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      const frames = buffer.split("\n\n");
+      buffer = frames.pop();
+      for (const frame of frames) {
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const data = frame.match(/^data: (.*)$/m)?.[1];
+        if (event && data) onEvent(event, JSON.parse(data));
+      }
+    }
+  } catch (err) {
+    console.error(err);
+    tailorStatus.textContent = "❌ Backend error.";
+  }
+}
+regenBullet.addEventListener("click", streamTailor);
+
 /* Animate semicircle gauge (arc length 157 approx) */
 function animateGauge(val) {
   const pct = Math.round(val);
@@ -288,10 +382,11 @@ downloadPdf.addEventListener("click", async () => {
   }
 
   try {
-    const resp = await fetch("http://127.0.0.1:8000/api/compile-pdf", {
+    const template = document.querySelector('input[name="tpl"]:checked')?.value || "classic";
+    const resp = await fetch(`${BACKEND_URL.replace(/\/$/, "")}/api/compose/pdf`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ profile: profileData, job: jobData }),
+      body: JSON.stringify({ profile: profileData, job: jobData, template }),
     });
 
     if (!resp.ok) throw new Error("Server returned " + resp.status);
@@ -399,3 +494,5 @@ document.addEventListener("keydown", e => {
   if (e.metaKey && e.key.toLowerCase() === "b") document.getElementById("composeResume").click();      // Cmd+B compose
   if (e.metaKey && e.key.toLowerCase() === "s") { e.preventDefault(); downloadTex.click(); }           // Cmd+S save .tex
 });
+
+updateMatch();